@@ -0,0 +1,41 @@
+"""upload_chunks: composite unique index on (upload_id, chunk_index)
+
+Migration changes:
+1. upload_chunks: remove duplicate (upload_id, chunk_index) rows, keeping the earliest
+2. upload_chunks: add unique index idx_upload_chunks_upload_chunk
+
+Revision ID: 7c4a2998315c
+Revises: 1e3b270d84f4
+Create Date: 2026-10-17 10:12:41.305118
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '7c4a2998315c'
+down_revision: Union[str, None] = '1e3b270d84f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ### 1. upload_chunks: drop duplicate chunk rows ###
+    op.execute(
+        """
+        DELETE FROM upload_chunks a
+        USING upload_chunks b
+        WHERE a.upload_id = b.upload_id
+          AND a.chunk_index = b.chunk_index
+          AND a.id > b.id
+        """
+    )
+
+    # ### 2. upload_chunks: composite unique index ###
+    with op.batch_alter_table('upload_chunks', schema=None) as batch_op:
+        batch_op.create_index('idx_upload_chunks_upload_chunk', ['upload_id', 'chunk_index'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('upload_chunks', schema=None) as batch_op:
+        batch_op.drop_index('idx_upload_chunks_upload_chunk')
@@ -213,7 +213,8 @@ def step_data_migrate() -> bool:
 def step_bump_version(new_version: str):
     """更新版本号"""
     typer.echo(f"🏷️  ⑤ 更新版本: {new_version}")
-    from shared.utils.version_manager import version_manager
+    from shared.utils.version_manager import get_version_manager
+    version_manager = get_version_manager()
     version_manager.bump_version(new_version)
 
     # 同步更新 DATABASE.migration
@@ -322,7 +323,8 @@ def do_rollback():
                 break
 
     # 3. 恢复版本号
-    from shared.utils.version_manager import version_manager
+    from shared.utils.version_manager import get_version_manager
+    version_manager = get_version_manager()
     version_manager.bump_version(snap["old_version"])
     version_manager.update_database(migration=snap.get("old_migration", "base"))
     typer.echo(f"  ✅ version.txt → {snap['old_version']}")
@@ -341,7 +343,8 @@ def upgrade(
     force: bool = typer.Option(False, "--force", help="跳过预检查强制升级"),
 ):
     """执行端到端系统升级"""
-    from shared.utils.version_manager import version_manager
+    from shared.utils.version_manager import get_version_manager
+    version_manager = get_version_manager()
 
     old_ver = version_manager.get_version()
     db_info = version_manager.get_database_info()
@@ -443,7 +446,8 @@ def _auto_rollback(old_ver: str, old_migration: str):
     """升级失败时自动回退"""
     typer.echo(f"\n⏪ 自动回退到 {old_ver}...")
     try:
-        from shared.utils.version_manager import version_manager
+        from shared.utils.version_manager import get_version_manager
+        version_manager = get_version_manager()
         if not _run_alembic_cmd("downgrade", old_migration or "base"):
             typer.echo("  ⚠️  Alembic 回退失败，请手动处理")
         version_manager.bump_version(old_ver)
@@ -4,6 +4,8 @@ FastAPI 应用入口点（精简版）
 """
 
 import argparse
+import atexit
+import os
 import signal
 import sys
 from pathlib import Path
@@ -48,6 +50,22 @@ def setup_signal_handlers():
     signal.signal(signal.SIGTERM, handler)
 
 
+def write_pid_file():
+    """写入 run/main.pid，供更新器直接定位并停止主程序"""
+    pid_file = Path(__file__).resolve().parent / 'run' / 'main.pid'
+    pid_file.parent.mkdir(parents=True, exist_ok=True)
+    pid_file.write_text(str(os.getpid()))
+
+    def remove_pid_file():
+        try:
+            if pid_file.read_text().strip() == str(os.getpid()):
+                pid_file.unlink()
+        except OSError:
+            pass
+
+    atexit.register(remove_pid_file)
+
+
 def run_supervisor_mode():
     try:
         from process_supervisor.supervisor_launcher import SupervisedLauncher
@@ -88,6 +106,7 @@ def main():
                 logger.error("FastAPI 应用实例创建失败")
                 sys.exit(1)
 
+            write_pid_file()
             logger.info(f"FastAPI 应用已加载，准备启动服务器...")
             logger.info(f"服务器地址: http://{args.host}:{args.port}")
 
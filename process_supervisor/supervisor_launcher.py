@@ -6,8 +6,12 @@ FastBlog 进程监督器启动器
 """
 
 
+import logging
+import logging.handlers
+import os
 import signal
 import sys
+import threading
 import time
 from pathlib import Path
 
@@ -17,18 +21,29 @@ sys.path.insert(0, str(project_root))
 
 from process_supervisor.process_manager import get_supervisor, ProcessSupervisor
 
-# 配置日志
+# 配置日志（日志文件按大小轮转，首次写入时才打开）
+os.makedirs('logs', exist_ok=True)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('logs/supervisor_launcher.log', encoding='utf-8'),
+        logging.handlers.RotatingFileHandler(
+            'logs/supervisor_launcher.log', maxBytes=10 * 1024 * 1024, backupCount=3,
+            encoding='utf-8', delay=True
+        ),
         logging.StreamHandler(sys.stdout)
     ]
 )
 from src.unified_logger import default_logger as logger
 
 
+# 系统状态输出间隔（秒）
+STATUS_INTERVAL = 30.0
+
+# 启动后等待进程进入运行状态的最长时间（秒）
+STARTUP_TIMEOUT = 5.0
+
+
 class SupervisedLauncher:
     """监督式启动器（增强版：支持 Web 管理界面）"""
 
@@ -37,6 +52,9 @@ class SupervisedLauncher:
         self.supervisor: ProcessSupervisor = None
         self.running = False
         self.web_app = None
+        self._stop_event = threading.Event()
+        # 启动验证时必须处于运行状态的关键进程
+        self._critical = frozenset(("main_app", "django_server"))
 
     def setup_signal_handlers(self):
         """设置信号处理器"""
@@ -92,7 +110,6 @@ class SupervisedLauncher:
         if "main_app" in self.supervisor.processes:
             main_process = self.supervisor.processes["main_app"]
             # 从环境变量读取 workers 数量，默认 6 个
-            import os
             workers_count = int(os.environ.get('UVICORN_WORKERS', '6'))
             main_process.config.command = [
                 sys.executable, "-m", "uvicorn", "src.app:app",
@@ -187,7 +204,7 @@ class SupervisedLauncher:
 
         # 等待系统稳定
         logger.info("等待所有进程启动稳定...")
-        time.sleep(5)
+        self._wait_for_processes(STARTUP_TIMEOUT)
 
         # 验证关键进程状态
         success = self._verify_processes()
@@ -204,11 +221,24 @@ class SupervisedLauncher:
 
         return success
 
+    def _wait_for_processes(self, timeout: float):
+        """轮询等待所有自动启动的进程进入运行状态，最长等待 timeout 秒"""
+        expected = [name for name, process in self.supervisor.processes.items()
+                    if process.config.autostart]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            statuses = self.supervisor.get_all_status()
+            if all(statuses.get(name, {}).get('status') == 'running' for name in expected):
+                return
+            time.sleep(0.1)
+
     def _verify_processes(self) -> bool:
         """验证关键进程状态（增强版：详细验证报告）"""
         # 只检查自动启动的关键进程
-        critical_processes = [name for name in ["main_app", "django_server"]
-                              if name in self.supervisor.processes and self.supervisor.processes[name].config.autostart]
+        critical_processes = {name for name in self._critical & self.supervisor.processes.keys()
+                              if self.supervisor.processes[name].config.autostart}
+        # 一次性获取所有进程状态，报告和关键进程检查共用
+        statuses = self.supervisor.get_all_status()
         all_healthy = True
 
         logger.info("\n" + "=" * 60)
@@ -216,7 +246,7 @@ class SupervisedLauncher:
         logger.info("=" * 60)
 
         for process_name, process in self.supervisor.processes.items():
-            status = self.supervisor.get_process_status(process_name)
+            status = statuses.get(process_name)
             is_critical = process_name in critical_processes
             should_be_running = process.config.autostart  # 是否应该运行
 
@@ -243,11 +273,10 @@ class SupervisedLauncher:
 
         # 检查关键进程
         for process_name in critical_processes:
-            if process_name in self.supervisor.processes:
-                status = self.supervisor.get_process_status(process_name)
-                if not status or status['status'] != 'running':
-                    logger.error(f"关键进程 {process_name} 未运行！")
-                    all_healthy = False
+            status = statuses.get(process_name)
+            if not status or status['status'] != 'running':
+                logger.error(f"关键进程 {process_name} 未运行！")
+                all_healthy = False
 
         return all_healthy
 
@@ -273,12 +302,13 @@ class SupervisedLauncher:
         logger.info("进入系统监控模式...")
 
         try:
+            # 按固定节拍每 30 秒输出一次系统状态，期间阻塞等待，关闭时立即唤醒
+            next_tick = time.monotonic() + STATUS_INTERVAL
             while self.running:
-                # 定期输出系统状态
-                if int(time.time()) % 30 == 0:  # 每30秒输出一次
-                    self._print_system_status()
-
-                time.sleep(1)
+                if self._stop_event.wait(max(0.0, next_tick - time.monotonic())):
+                    break
+                self._print_system_status()
+                next_tick += STATUS_INTERVAL
 
         except KeyboardInterrupt:
             logger.info("收到键盘中断信号")
@@ -287,7 +317,7 @@ class SupervisedLauncher:
 
     def _print_system_status(self):
         """打印系统状态（增强版：详细统计）"""
-        if not self.supervisor:
+        if not self.supervisor or not logger.isEnabledFor(logging.INFO):
             return
 
         statuses = self.supervisor.get_all_status()
@@ -314,6 +344,7 @@ class SupervisedLauncher:
 
         logger.info("正在关闭系统...")
         self.running = False
+        self._stop_event.set()
 
         if self.supervisor:
             self.supervisor.shutdown()
@@ -30,7 +30,8 @@ sys.path.insert(0, str(project_root))
 def get_current_version() -> str:
     """获取当前版本号"""
     try:
-        from shared.utils.version_manager import version_manager
+        from shared.utils.version_manager import get_version_manager
+        version_manager = get_version_manager()
         return version_manager.get_version()
     except Exception:
         return Path("version.txt").read_text(encoding="utf-8").strip()
@@ -4,7 +4,7 @@ SQLAlchemy 模型定义 - UploadChunk
 生成时间：2026-06-13 23:12:16
 """
 
-from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, DateTime, Index
 from datetime import datetime
 
 from shared.models import Base  # 使用统一的 Base（跨子包引用）
@@ -16,6 +16,9 @@ class UploadChunk(Base):
     __tablename__ = 'upload_chunks'
 
 
+    __table_args__ = (
+        Index('idx_upload_chunks_upload_chunk', 'upload_id', 'chunk_index', unique=True),
+    )
 
 
     id = Column(BigInteger, primary_key=True, autoincrement=True, doc='分块 ID')
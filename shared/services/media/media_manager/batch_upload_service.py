@@ -59,7 +59,7 @@ class BatchUploadService:
                     from src.utils.upload.public_upload import FileProcessor
                     processor = FileProcessor(user_id=user_id, allowed_mimes=allowed_mimes, allowed_size=max_file_size)
 
-                    is_valid, validation_result = processor.validate_file(content, file_obj.filename or "unknown")
+                    is_valid, validation_result = await processor.validate_file_async(content, file_obj.filename or "unknown")
                     if not is_valid:
                         failed_count += 1
                         error_msg = f"文件 {file_obj.filename} 验证失败: {validation_result}"
@@ -144,7 +144,8 @@ class BatchUploadService:
             operations: List[str]
     ) -> Dict[str, Any]:
         """处理单个媒体文件"""
-        from src.utils.storage.s3_storage import s3_storage
+        from src.utils.storage.s3_storage import get_s3_storage
+        s3_storage = get_s3_storage()
         import json
         
         result = {}
@@ -19,13 +19,13 @@ from shared.utils.update_history import (
 )
 from shared.utils.version_manager import (
     VersionManager,
-    version_manager,
+    get_version_manager,
 )
 
 __all__ = [
     # Version Manager
     'VersionManager',
-    'version_manager',
+    'get_version_manager',
     
     # Update History
     'UpdateHistoryManager',
@@ -41,3 +41,4 @@ __all__ = [
     'auto_update_checker',
     'check_updates_now',
 ]
+
@@ -114,7 +114,8 @@ class AutoUpdateChecker:
 
         # 获取当前版本
         try:
-            from shared.utils.version_manager import version_manager
+            from shared.utils.version_manager import get_version_manager
+            version_manager = get_version_manager()
             backend_info = version_manager.get_backend_version()
             self.current_version = backend_info.get('version', '0.0.0')
         except Exception as e:
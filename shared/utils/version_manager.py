@@ -2,11 +2,15 @@
 版本管理器
 统一版本管理 — 同时支持 JSON 和旧的 configparser 格式
 """
+import copy
 import json
 import os
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
+
+# 已解析的版本文件：绝对路径 -> (st_mtime_ns, st_size, data)，文件未变化时免去重复读取和解析
+_PARSE_CACHE: Dict[str, Tuple[int, int, dict]] = {}
 
 
 class VersionManager:
@@ -23,21 +27,35 @@ class VersionManager:
         self._data = self._load()
 
     def _load(self) -> dict:
-        """加载版本信息（JSON 优先，回退到 configparser）"""
+        """加载版本信息（文件未修改时直接使用解析缓存）"""
         if not self.version_file.exists():
             return self._create_default()
 
-        raw = self.version_file.read_text(encoding='utf-8')
+        st = self.version_file.stat()
+        cache_key = str(self.version_file.resolve())
+        cached = _PARSE_CACHE.get(cache_key)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return copy.deepcopy(cached[2])
+
+        data = self._parse(self.version_file.read_text(encoding='utf-8'))
+        if data is None:
+            return self._create_default()
+
+        _PARSE_CACHE[cache_key] = (st.st_mtime_ns, st.st_size, copy.deepcopy(data))
+        return data
 
+    @staticmethod
+    def _parse(raw: str) -> Optional[dict]:
+        """解析版本文件内容（JSON 优先，回退到 configparser），无法解析时返回 None"""
         # 尝试 JSON 解析
         try:
             return json.loads(raw)
         except json.JSONDecodeError:
             pass
 
-        # 回退：configparser 格式
+        # 回退：configparser 格式（值中不需要 % 插值，使用 RawConfigParser）
         import configparser
-        cp = configparser.ConfigParser()
+        cp = configparser.RawConfigParser()
         try:
             cp.read_string(raw)
             data = {}
@@ -45,7 +63,7 @@ class VersionManager:
                 data[section.lower()] = dict(cp[section])
             return data
         except Exception:
-            return self._create_default()
+            return None
 
     def _create_default(self) -> dict:
         data = {
@@ -59,10 +77,23 @@ class VersionManager:
     def _save(self, data: dict = None):
         if data is None:
             data = self._data
-        self.version_file.write_text(
-            json.dumps(data, ensure_ascii=False, indent=2),
-            encoding='utf-8'
-        )
+        content = json.dumps(data, ensure_ascii=False, indent=2)
+
+        # 内容未变化时跳过写入
+        try:
+            if self.version_file.read_text(encoding='utf-8') == content:
+                return
+        except FileNotFoundError:
+            pass
+
+        # 先写临时文件再替换，避免其他进程读到写了一半的版本文件
+        tmp_file = self.version_file.with_name(self.version_file.name + '.tmp')
+        tmp_file.write_text(content, encoding='utf-8')
+        os.replace(tmp_file, self.version_file)
+
+        # 用刚写入的内容刷新解析缓存
+        st = self.version_file.stat()
+        _PARSE_CACHE[str(self.version_file.resolve())] = (st.st_mtime_ns, st.st_size, copy.deepcopy(data))
 
     # ── 读取 ──
 
@@ -107,4 +138,20 @@ class VersionManager:
         self._save()
 
 
-version_manager = VersionManager()
+# 全局实例延迟创建：导入模块时不读取（或新建）version.txt
+_version_manager: Optional[VersionManager] = None
+
+
+def get_version_manager() -> VersionManager:
+    """获取全局版本管理器实例，首次调用时创建"""
+    global _version_manager
+    if _version_manager is None:
+        _version_manager = VersionManager()
+    return _version_manager
+
+
+def __getattr__(name: str):
+    # 兼容 `from shared.utils.version_manager import version_manager`
+    if name == 'version_manager':
+        return get_version_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
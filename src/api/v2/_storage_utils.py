@@ -3,7 +3,7 @@
 """
 from decimal import Decimal
 
-from src.utils.storage.s3_storage import s3_storage
+from src.utils.storage.s3_storage import get_s3_storage
 
 
 def convert_storage_size(total_bytes):
@@ -40,7 +40,7 @@ def async_file_cleanup(db_session, cleanup_data):
             try:
                 if storage_path.startswith('s3://'):
                     # 从S3删除文件
-                    success = s3_storage.delete_file(storage_path)
+                    success = get_s3_storage().delete_file(storage_path)
                     if success:
                         print(f"成功从S3删除文件: {storage_path}")
                     else:
@@ -57,7 +57,7 @@ async def upload_cover(
         allowed_size=8 * 1024 * 1024
     )
 
-    is_valid, validation_result = processor.validate_file(file_data, file.filename)
+    is_valid, validation_result = await processor.validate_file_async(file_data, file.filename)
     if not is_valid:
         return JSONResponse({'code': 400, 'msg': validation_result}, status_code=400)
 
@@ -251,7 +251,8 @@ async def batch_optimize_images(
         current_user=Depends(jwt_required),
         db: AsyncSession = Depends(get_async_db)
 ):
-    from src.utils.storage.s3_storage import s3_storage
+    from src.utils.storage.s3_storage import get_s3_storage
+    s3_storage = get_s3_storage()
 
     stmt = select(Media).where(Media.id.in_(media_ids))
     result = await db.execute(stmt)
@@ -376,7 +377,8 @@ async def upload_edited_image(
 ):
     """上传编辑后的图片并更新媒体记录"""
     try:
-        from src.utils.storage.s3_storage import s3_storage
+        from src.utils.storage.s3_storage import get_s3_storage
+        s3_storage = get_s3_storage()
         import hashlib
         from datetime import datetime
 
@@ -342,7 +342,8 @@ async def get_video_thumbnail(
             status_code=404
         )
 
-    from src.utils.storage.s3_storage import s3_storage
+    from src.utils.storage.s3_storage import get_s3_storage
+    s3_storage = get_s3_storage()
     thumbnail_data = s3_storage.read_file(media.thumbnail_path)
 
     if not thumbnail_data:
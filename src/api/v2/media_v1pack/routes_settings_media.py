@@ -94,7 +94,7 @@ async def upload_settings_media(
     )
 
     # 验证文件
-    is_valid, validation_result = processor.validate_file(file_data, file.filename)
+    is_valid, validation_result = await processor.validate_file_async(file_data, file.filename)
     if not is_valid:
         return JSONResponse(
             {'success': False, 'message': validation_result},
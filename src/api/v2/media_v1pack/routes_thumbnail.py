@@ -74,7 +74,8 @@ async def get_media_thumbnail(
 
     # 如果已有缩略图路径，直接返回
     if media.thumbnail_path:
-        from src.utils.storage.s3_storage import s3_storage
+        from src.utils.storage.s3_storage import get_s3_storage
+        s3_storage = get_s3_storage()
         thumbnail_data = s3_storage.read_file(media.thumbnail_path)
 
         if thumbnail_data:
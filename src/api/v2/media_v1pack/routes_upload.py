@@ -1,8 +1,6 @@
 """
 媒体上传（普通上传、分块上传）
 """
-import hashlib
-
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, Request, HTTPException
@@ -222,7 +220,7 @@ async def _process_single_file(user_id, file_data, filename, allowed_size, allow
     }
 
     processor = FileProcessor(user_id, allowed_mimes=allowed_set, allowed_size=allowed_size)
-    is_valid, validation_result = processor.validate_file(file_data, filename)
+    is_valid, validation_result = await processor.validate_file_async(file_data, filename)
 
     if not is_valid:
         return {'success': False, 'error': validation_result}
@@ -293,14 +291,75 @@ async def chunked_upload_chunk(
     if not chunk_data:
         return JSONResponse({'success': False, 'error': '分块数据为空'}, status_code=400)
 
-    if hashlib.sha256(chunk_data).hexdigest() != chunk_hash:
-        return JSONResponse({'success': False, 'error': '分块哈希验证失败'}, status_code=400)
-
+    # 分块哈希在写入分块文件的线程池调用中校验
     processor = ChunkedUploadProcessor(current_user_obj.id)
     result = await processor.upload_chunk(upload_id, chunk_index, chunk_data, chunk_hash, db)
     return JSONResponse(result, status_code=200 if result.get('success') else 400)
 
 
+@router.post('/upload/chunked/chunk/stream')
+@_catch
+async def chunked_upload_chunk_stream(
+        request: Request,
+        current_user_obj=Depends(jwt_required),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """以原始请求体流式上传分块，参数通过查询字符串传递"""
+    upload_id = request.query_params.get('upload_id')
+    chunk_index_str = request.query_params.get('chunk_index')
+    chunk_hash = request.query_params.get('chunk_hash')
+    if not upload_id or chunk_index_str is None or not chunk_hash:
+        return JSONResponse({'success': False, 'error': '缺少必要参数'}, status_code=400)
+    try:
+        chunk_index = int(chunk_index_str)
+    except (ValueError, TypeError):
+        return JSONResponse({'success': False, 'error': 'chunk_index必须是数字'}, status_code=400)
+
+    processor = ChunkedUploadProcessor(current_user_obj.id)
+    result = await processor.upload_chunk_streaming(upload_id, chunk_index, chunk_hash, request.stream(), db)
+    return JSONResponse(result, status_code=200 if result.get('success') else 400)
+
+
+@router.post('/upload/chunked/bulk')
+@_catch
+async def chunked_upload_bulk(
+        request: Request,
+        current_user_obj=Depends(jwt_required),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """一次请求上传多个分块：chunk_index / chunk_hash / chunk 字段按顺序一一对应"""
+    form = await request.form()
+    upload_id = form.get('upload_id')
+    chunk_indices = form.getlist('chunk_index')
+    chunk_hashes = form.getlist('chunk_hash')
+    chunk_items = form.getlist('chunk')
+    if not upload_id or not chunk_indices:
+        return JSONResponse({'success': False, 'error': '缺少必要参数'}, status_code=400)
+    if not (len(chunk_indices) == len(chunk_hashes) == len(chunk_items)):
+        return JSONResponse({'success': False, 'error': '分块参数数量不一致'}, status_code=400)
+
+    chunks = []
+    for chunk_index_str, chunk_hash, chunk_item in zip(chunk_indices, chunk_hashes, chunk_items):
+        try:
+            chunk_index = int(chunk_index_str)
+        except (ValueError, TypeError):
+            return JSONResponse({'success': False, 'error': 'chunk_index必须是数字'}, status_code=400)
+
+        if hasattr(chunk_item, 'read'):
+            chunk_data = await chunk_item.read()
+        elif isinstance(chunk_item, str):
+            chunk_data = chunk_item.encode('utf-8')
+        else:
+            chunk_data = chunk_item
+        if not chunk_data:
+            return JSONResponse({'success': False, 'error': f'分块 {chunk_index} 数据为空'}, status_code=400)
+        chunks.append((chunk_index, chunk_data, chunk_hash))
+
+    processor = ChunkedUploadProcessor(current_user_obj.id)
+    result = await processor.upload_chunks_bulk(upload_id, chunks, db)
+    return JSONResponse(result, status_code=200 if result.get('success') else 400)
+
+
 @router.post('/upload/chunked/complete')
 @_catch
 async def chunked_upload_complete(
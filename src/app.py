@@ -922,17 +922,16 @@ def create_app(config=None):
     app.mount("/api/v2/static", StaticFiles(directory=static_dir), name="static")
 
     # 本地存储 - 使用统一前缀 /api/v2/assets/storage 避免与业务路由冲突
-    try:
-        from src.setting import app_config
-        local_storage = getattr(app_config, 'LOCAL_STORAGE_PATH', 'storage')
-    except Exception:
-        local_storage = 'storage'
-    os.makedirs(local_storage, exist_ok=True)
-    app.mount("/api/v2/assets/storage", StaticFiles(directory=local_storage), name="local-storage")
+    # 挂载目录与前缀取自存储实例的配置快照，与实际写入文件和生成 URL 的位置保持一致
+    from src.utils.storage import get_s3_storage
+    from src.utils.storage.s3_storage import StorageStaticFiles
+    storage_config = get_s3_storage().config
+    local_storage = storage_config.base_path
+    app.mount(storage_config.url_prefix, StorageStaticFiles(directory=local_storage), name="local-storage")
 
     objects_dir = os.path.join(local_storage, 'objects')
     os.makedirs(objects_dir, exist_ok=True)
-    app.mount("/api/v2/assets/storage/objects", StaticFiles(directory=objects_dir), name="storage-objects")
+    app.mount(f"{storage_config.url_prefix}/objects", StorageStaticFiles(directory=objects_dir), name="storage-objects")
 
     themes_dir = os.path.join(os.path.dirname(__file__), "..", "themes")
     if os.path.exists(themes_dir):
@@ -7,13 +7,13 @@ from typing import Dict, Any
 from sqlalchemy.orm import Session
 
 from shared.models import SystemSettings
-from src.utils.storage.s3_storage import s3_storage
+from src.utils.storage.s3_storage import get_s3_storage
 
 
 class ConfigManager:
     def __init__(self):
         # 在FastAPI环境中，邮件配置的处理方式可能需要调整
-        self.s3_storage = s3_storage
+        self.s3_storage = get_s3_storage()
         self._app_config = None  # 延迟加载app_config以避免循环导入
 
     @property
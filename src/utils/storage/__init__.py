@@ -1,4 +1,4 @@
 """存储工具包"""
-from src.utils.storage.s3_storage import s3_storage
+from src.utils.storage.s3_storage import get_s3_storage
 
-__all__ = ['s3_storage']
+__all__ = ['get_s3_storage']
@@ -2,16 +2,45 @@
 本地文件存储服务
 提供文件存储与访问功能，兼容原 s3_storage 接口
 """
+import functools
 import os
+import re
+import shutil
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+# 内容寻址文件（文件名即内容哈希）永不变化，可让浏览器/CDN 长期缓存
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+_CONTENT_HASH_STEM = re.compile(r'^[0-9a-f]{64}$')
+
+
+@dataclass(frozen=True, slots=True)
+class StorageConfig:
+    """存储配置快照，构造时从 app_config 读取一次，之后不再重复 getattr"""
+    base_path: str = "storage"
+    url_prefix: str = "/api/v2/assets/storage"
+
+    @classmethod
+    def from_app_config(cls) -> "StorageConfig":
+        """从 app_config 构建配置快照"""
+        try:
+            from src.setting import app_config
+            base_path = getattr(app_config, 'LOCAL_STORAGE_PATH', None) or 'storage'
+        except Exception:
+            base_path = 'storage'
+        return cls(base_path=base_path)
+
 
 class S3Storage:
     """本地文件存储（兼容原 S3 接口）"""
 
-    def __init__(self, base_path: str = "storage"):
-        self.base_path = Path(base_path)
+    def __init__(self, config: Optional[StorageConfig] = None):
+        self.config = config or StorageConfig.from_app_config()
+        self.base_path = Path(self.config.base_path)
         self.base_path.mkdir(parents=True, exist_ok=True)
 
     async def upload_fileobj(self, fileobj, key: str) -> bool:
@@ -37,7 +66,7 @@ class S3Storage:
 
     def get_file_url(self, key: str) -> str:
         """获取文件 URL"""
-        return f"/api/v2/assets/storage/{key}"
+        return f"{self.config.url_prefix}/{key}"
 
     def save_file(self, file_hash: str, file_data: bytes, original_filename: str) -> str:
         """保存文件到存储（同步，兼容 FileProcessor.save_file 调用）"""
@@ -49,6 +78,27 @@ class S3Storage:
             f.write(file_data)
         return key
 
+    def save_fileobj(self, file_hash: str, fileobj, original_filename: str) -> str:
+        """将文件对象从头开始流式写入存储（同步，不把整个文件读入内存）"""
+        _, ext = os.path.splitext(original_filename)
+        key = f"{file_hash[:2]}/{file_hash}{ext}"
+        full_path = self.base_path / key
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        fileobj.seek(0)
+        with open(full_path, "wb") as f:
+            shutil.copyfileobj(fileobj, f, 1024 * 1024)
+        return key
+
+    def save_file_from_path(self, file_hash: str, source_path: str, original_filename: str) -> str:
+        """将磁盘上已有的文件移入存储（同步，源文件会被移走，不经过内存）"""
+        _, ext = os.path.splitext(original_filename)
+        key = f"{file_hash[:2]}/{file_hash}{ext}"
+        full_path = self.base_path / key
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        # 同一文件系统内为一次 rename，跨设备时退化为复制
+        shutil.move(source_path, full_path)
+        return key
+
     async def download_file(self, key: str) -> Optional[bytes]:
         """下载文件内容"""
         full_path = self.base_path / key
@@ -66,5 +116,17 @@ class S3Storage:
             return f.read()
 
 
-# 全局实例
-s3_storage = S3Storage()
+class StorageStaticFiles(StaticFiles):
+    """本地存储静态挂载，为内容寻址文件附加长期缓存头"""
+
+    def file_response(self, full_path, *args, **kwargs) -> Response:
+        response = super().file_response(full_path, *args, **kwargs)
+        if _CONTENT_HASH_STEM.match(Path(full_path).stem):
+            response.headers.setdefault('Cache-Control', IMMUTABLE_CACHE_CONTROL)
+        return response
+
+
+@functools.lru_cache(maxsize=None)
+def get_s3_storage() -> S3Storage:
+    """获取全局存储实例（首次调用时创建，此后复用同一实例）"""
+    return S3Storage()
@@ -1,11 +1,14 @@
 import asyncio
 import hashlib
-
+import json
+import mmap
 import os
-import shutil
+import queue
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import AsyncIterator, BinaryIO, List, Optional, Tuple, Union
 
 try:
     import magic
@@ -15,18 +18,381 @@ except ImportError:
     HAS_MAGIC = False
     magic = None
 from fastapi import Depends, UploadFile
-from sqlalchemy import select
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from shared.models import FileHash, Media, UploadChunk, UploadTask
 from shared.services.media.media_manager import media_service
-from src.extensions import get_async_db_session as get_async_db
-from src.utils.storage import s3_storage
+from src.extensions import cache, get_async_db_session as get_async_db
+from src.utils.storage import get_s3_storage
 from src.utils.image.video_processor import video_processor
 
 from src.unified_logger import default_logger as logger
 from src.setting import app_config
 
+# 批量哈希时启用线程并行的最小文件数（文件太少时线程调度开销得不偿失）
+PARALLEL_HASH_MIN_FILES = 4
+
+# MIME 检测只需文件头，只把前 N 字节交给 libmagic
+MIME_SNIFF_BYTES = 8192
+
+# 流式读取上传文件时每次读取的字节数
+STREAM_READ_SIZE = 1024 * 1024
+
+# 流式分块上传的缓冲区池：缓冲区按 chunk_size 分配后复用，
+# 内存分配次数只与并发上传数相关，而与分块总数无关
+CHUNK_BUFFER_POOL_SIZE = 8
+_chunk_buffer_pool: "queue.LifoQueue[bytearray]" = queue.LifoQueue(maxsize=CHUNK_BUFFER_POOL_SIZE)
+
+
+def _acquire_chunk_buffer(size: int) -> bytearray:
+    """从池中取出一个不小于 size 的缓冲区，池为空时新建"""
+    try:
+        buffer = _chunk_buffer_pool.get_nowait()
+    except queue.Empty:
+        return bytearray(size)
+    if len(buffer) < size:
+        return bytearray(size)
+    return buffer
+
+
+def _release_chunk_buffer(buffer: bytearray):
+    """归还缓冲区，池已满时直接丢弃"""
+    try:
+        _chunk_buffer_pool.put_nowait(buffer)
+    except queue.Full:
+        pass
+
+
+def _sha256_hexdigest(data: Union[bytes, memoryview]) -> str:
+    """计算 SHA-256 十六进制摘要（在线程池中调用）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+# FileHash 存在性读穿缓存的过期时间（秒）
+FILE_HASH_CACHE_TTL = 300
+
+
+def _file_hash_cache_key(file_hash: str, file_size: int) -> str:
+    return f"fh:{file_hash}:{file_size}"
+
+
+def _cache_file_hash(file_hash: str, file_size: int, file_id: int, storage_path: str):
+    """缓存已存在的 FileHash 记录（仅 id 和存储路径）"""
+    try:
+        cache.set(
+            _file_hash_cache_key(file_hash, file_size),
+            json.dumps({'id': file_id, 'storage_path': storage_path}),
+            ex=FILE_HASH_CACHE_TTL
+        )
+    except Exception as e:
+        logger.debug(f"FileHash 缓存写入失败: {e}")
+
+
+def _get_cached_file_hash(file_hash: str, file_size: int) -> Optional[dict]:
+    """读取缓存的 FileHash 信息，未命中或缓存不可用时返回 None"""
+    try:
+        raw = cache.get(_file_hash_cache_key(file_hash, file_size))
+        return json.loads(raw) if raw else None
+    except Exception:
+        return None
+
+
+def _get_cached_file_hashes(keys: List[Tuple[str, int]]) -> dict:
+    """
+    一次 MGET 读取多个 FileHash 缓存
+
+    Returns:
+        {(file_hash, file_size): 缓存信息}，只包含命中的键；缓存不可用时返回空字典
+    """
+    if not keys:
+        return {}
+    cache_keys = [_file_hash_cache_key(file_hash, file_size) for file_hash, file_size in keys]
+    try:
+        raw = cache.mget(cache_keys)
+    except Exception as e:
+        logger.debug(f"FileHash 缓存批量读取失败: {e}")
+        return {}
+
+    # Redis 客户端按键顺序返回列表，内存缓存返回字典
+    values = [raw.get(key) for key in cache_keys] if isinstance(raw, dict) else raw
+    cached = {}
+    for key, value in zip(keys, values):
+        if not value:
+            continue
+        try:
+            cached[key] = json.loads(value)
+        except (TypeError, ValueError):
+            continue
+    return cached
+
+
+def _forget_cached_file_hash(file_hash: str, file_size: int):
+    """删除失效的 FileHash 缓存"""
+    try:
+        cache.delete(_file_hash_cache_key(file_hash, file_size))
+    except Exception:
+        pass
+
+
+async def _bump_cached_file_hashes(db: AsyncSession, hits: dict) -> set:
+    """
+    缓存命中时直接按 id 增加引用计数，所有命中的记录在一条 UPDATE 中完成
+
+    Args:
+        hits: {(file_hash, file_size): (FileHash id, 增加的引用数)}
+
+    Returns:
+        实际更新到的键集合；缓存的记录已不存在时删除对应缓存，由调用方回退到数据库查询
+    """
+    if not hits:
+        return set()
+
+    increments = {file_id: count for file_id, count in hits.values()}
+    result = await db.execute(
+        update(FileHash)
+        .where(FileHash.id.in_(list(increments)))
+        .values(reference_count=FileHash.reference_count + case(increments, value=FileHash.id, else_=0))
+        .returning(FileHash.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated_ids = set(result.scalars().all())
+
+    bumped = set()
+    for key, (file_id, _) in hits.items():
+        if file_id in updated_ids:
+            bumped.add(key)
+        else:
+            _forget_cached_file_hash(*key)
+    return bumped
+
+
+async def _release_file_hash_references(db: AsyncSession, file_id: int, count: int):
+    """撤销已提交的引用计数递增（分组处理失败时调用）"""
+    try:
+        await db.execute(
+            update(FileHash)
+            .where(FileHash.id == file_id)
+            .values(reference_count=FileHash.reference_count - count)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"撤销 FileHash 引用计数失败: {e}")
+
+
+# 每个线程持有独立的 libmagic 句柄，避免线程池中的调用争用 magic.from_buffer 的全局锁
+_magic_local = threading.local()
+
+
+def _magic_from_buffer(header: bytes) -> str:
+    """使用当前线程的 libmagic 句柄识别 MIME 类型"""
+    detector = getattr(_magic_local, 'detector', None)
+    if detector is None:
+        detector = _magic_local.detector = magic.Magic(mime=True)
+    return detector.from_buffer(header)
+
+
+# 常见格式的文件头签名（结果与 libmagic 一致），按顺序匹配
+_HEADER_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'%PDF-', 'application/pdf'),
+    (b'fLaC', 'audio/flac'),
+    (b"7z\xbc\xaf'\x1c", 'application/x-7z-compressed'),
+    (b'\xfd7zXZ\x00', 'application/x-xz'),
+)
+
+# RIFF 容器按第 8-12 字节的格式标识区分
+_RIFF_FORMATS = {b'WEBP': 'image/webp', b'WAVE': 'audio/x-wav'}
+
+# ISO BMFF (ftyp) 按第 8-12 字节的主品牌区分
+_FTYP_BRANDS = {b'isom': 'video/mp4', b'mp41': 'video/mp4', b'mp42': 'video/mp4'}
+
+
+def _sniff_common_mime(header: bytes) -> Optional[str]:
+    """按文件头签名快速识别常见格式，未命中时返回 None 交由 libmagic 处理"""
+    for signature, mime_type in _HEADER_SIGNATURES:
+        if header.startswith(signature):
+            return mime_type
+    if header[:4] == b'RIFF':
+        return _RIFF_FORMATS.get(header[8:12])
+    if header[4:8] == b'ftyp':
+        return _FTYP_BRANDS.get(header[8:12])
+    return None
+
+
+# 图片格式
+_IMAGE_MIME_TYPES = {
+    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
+    '.gif': 'image/gif', '.bmp': 'image/bmp', '.webp': 'image/webp',
+    '.svg': 'image/svg+xml', '.tiff': 'image/tiff', '.tif': 'image/tiff'
+}
+
+# 视频格式
+_VIDEO_MIME_TYPES = {
+    '.mp4': 'video/mp4', '.mov': 'video/quicktime', '.avi': 'video/x-msvideo',
+    '.mkv': 'video/x-matroska', '.flv': 'video/x-flv', '.wmv': 'video/x-ms-wmv',
+    '.webm': 'video/webm', '.m4v': 'video/x-m4v'
+}
+
+# 音频格式
+_AUDIO_MIME_TYPES = {
+    '.mp3': 'audio/mpeg', '.wav': 'audio/wav', '.flac': 'audio/flac',
+    '.aac': 'audio/aac', '.ogg': 'audio/ogg', '.oga': 'audio/ogg',
+    '.m4a': 'audio/mp4', '.opus': 'audio/ogg',
+    '.weba': 'audio/webm', '.wma': 'audio/x-ms-wma',
+}
+
+# 文档格式
+_DOCUMENT_MIME_TYPES = {
+    '.pdf': 'application/pdf',
+    '.doc': 'application/msword',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.docm': 'application/vnd.ms-word.document.macroEnabled.12',
+    '.dotx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.template',
+    '.dotm': 'application/vnd.ms-word.template.macroEnabled.12',
+    '.xls': 'application/vnd.ms-excel',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.xlsm': 'application/vnd.ms-excel.sheet.macroEnabled.12',
+    '.xlsb': 'application/vnd.ms-excel.sheet.binary.macroEnabled.12',
+    '.xlt': 'application/vnd.ms-excel',
+    '.xltm': 'application/vnd.ms-excel.template.macroEnabled.12',
+    '.ods': 'application/vnd.oasis.opendocument.spreadsheet',
+    '.fods': 'application/vnd.oasis.opendocument.spreadsheet',
+    '.numbers': 'application/x-iwork-numbers-sffnumbers',
+    '.ppt': 'application/vnd.ms-powerpoint',
+    '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    '.pptm': 'application/vnd.ms-powerpoint.presentation.macroEnabled.12',
+    '.potx': 'application/vnd.openxmlformats-officedocument.presentationml.template',
+    '.potm': 'application/vnd.ms-powerpoint.template.macroEnabled.12',
+    '.ppsx': 'application/vnd.openxmlformats-officedocument.presentationml.slideshow',
+    '.ppsm': 'application/vnd.ms-powerpoint.slideshow.macroEnabled.12',
+    '.txt': 'text/plain',
+    '.md': 'text/markdown',
+    '.csv': 'text/csv',
+    '.html': 'text/html', '.htm': 'text/html',
+}
+
+# 压缩格式
+_ARCHIVE_MIME_TYPES = {
+    '.zip': 'application/zip', '.zipx': 'application/zip',
+    '.rar': 'application/x-rar-compressed',
+    '.7z': 'application/x-7z-compressed',
+    '.gz': 'application/gzip', '.gzip': 'application/gzip',
+    '.tar': 'application/x-tar',
+    '.bz2': 'application/x-bzip2', '.bzip2': 'application/x-bzip2',
+    '.xz': 'application/x-xz',
+    '.zst': 'application/zstd', '.tzst': 'application/zstd',
+    '.lzma': 'application/x-lzma',
+    '.tgz': 'application/gzip',
+    '.tbz': 'application/x-bzip2', '.tbz2': 'application/x-bzip2',
+    '.txz': 'application/x-xz',
+    '.ar': 'application/x-archive',
+    '.xar': 'application/x-xar',
+    '.cab': 'application/x-cab',
+    '.cpio': 'application/x-cpio',
+    '.iso': 'application/x-iso9660-image',
+    '.lha': 'application/x-lha', '.lzh': 'application/x-lzh',
+    '.jar': 'application/java-archive',
+    '.war': 'application/java-archive',
+    '.ear': 'application/java-archive',
+    '.apk': 'application/vnd.android.package-archive',
+    '.cbz': 'application/zip',
+    '.cbr': 'application/x-rar-compressed',
+}
+
+# 3D 模型 & CAD
+_CAD_3D_MIME_TYPES = {
+    '.glb': 'model/gltf-binary',
+    '.gltf': 'model/gltf+json',
+    '.obj': 'model/obj',
+    '.stl': 'model/stl',
+    '.ply': 'model/ply',
+    '.fbx': 'application/octet-stream',
+    '.dae': 'model/vnd.collada+xml',
+    '.3ds': 'image/x-3ds',
+    '.3mf': 'model/3mf',
+    '.amf': 'application/x-amf',
+    '.usd': 'model/vnd.usd',
+    '.usda': 'model/vnd.usda',
+    '.usdc': 'model/vnd.usdc',
+    '.usdz': 'model/vnd.usdz+zip',
+    '.kmz': 'application/vnd.google-earth.kmz',
+    '.pcd': 'application/octet-stream',
+    '.wrl': 'model/vrml', '.vrml': 'model/vrml',
+    '.xyz': 'chemical/x-xyz',
+    '.vtk': 'application/octet-stream',
+    '.vtp': 'application/octet-stream',
+    '.step': 'application/step', '.stp': 'application/step',
+    '.iges': 'application/iges', '.igs': 'application/iges',
+    '.ifc': 'application/x-ifc',
+    '.3dm': 'model/x-3dm',
+    '.dwg': 'image/vnd.dwg',
+    '.dxf': 'image/vnd.dxf',
+    '.dwf': 'application/dwf',
+    '.dwfx': 'application/dwf',
+    '.xps': 'application/oxps',
+}
+
+# 代码 & 文本
+_CODE_MIME_TYPES = {
+    '.json': 'application/json',
+    '.xml': 'application/xml',
+    '.js': 'text/javascript', '.mjs': 'text/javascript', '.cjs': 'text/javascript',
+    '.ts': 'text/typescript', '.tsx': 'text/typescript',
+    '.jsx': 'text/javascript',
+    '.css': 'text/css',
+    '.java': 'text/x-java',
+    '.py': 'text/x-python',
+    '.log': 'text/plain',
+    '.yaml': 'text/yaml', '.yml': 'text/yaml',
+    '.ini': 'text/plain',
+    '.sh': 'application/x-sh', '.bash': 'application/x-sh',
+    '.sql': 'text/x-sql',
+    '.go': 'text/x-go',
+    '.rs': 'text/x-rust',
+    '.php': 'text/x-php',
+    '.c': 'text/x-c', '.cpp': 'text/x-c++', '.cc': 'text/x-c++',
+    '.h': 'text/x-c', '.hpp': 'text/x-c++',
+    '.cs': 'text/x-csharp',
+    '.diff': 'text/x-diff',
+    '.vue': 'text/html',
+}
+
+# 电子书 & 邮件 & 其他
+_OTHER_MIME_TYPES = {
+    '.epub': 'application/epub+zip',
+    '.umd': 'application/x-umd-book',
+    '.eml': 'message/rfc822',
+    '.msg': 'application/vnd.ms-outlook',
+    '.ofd': 'application/ofd',
+    '.typ': 'text/typst', '.typst': 'text/typst',
+    '.excalidraw': 'application/x-excalidraw',
+    '.drawio': 'application/x-drawio', '.dio': 'application/x-drawio',
+    '.olb': 'application/octet-stream',
+    '.dra': 'application/octet-stream',
+}
+
+
+# 扩展名 -> MIME 的合并映射，导入时构建一次；重复扩展名以靠前分类为准
+_EXT_TO_MIME = {
+    **_OTHER_MIME_TYPES,
+    **_CODE_MIME_TYPES,
+    **_CAD_3D_MIME_TYPES,
+    **_ARCHIVE_MIME_TYPES,
+    **_DOCUMENT_MIME_TYPES,
+    **_AUDIO_MIME_TYPES,
+    **_VIDEO_MIME_TYPES,
+    **_IMAGE_MIME_TYPES,
+}
+
 
 class FileProcessor:
     """文件处理器，统一处理文件上传逻辑"""
@@ -37,18 +403,35 @@ class FileProcessor:
         self.allowed_mimes = allowed_mimes or {'image/jpeg', 'image/png'}
         self.allowed_size = allowed_size
 
-    def validate_file(self, file_data: bytes, filename: str) -> tuple[bool, Union[str, dict]]:
-        """验证文件基本属性"""
+    def validate_file(self, file_data: bytes, filename: str,
+                      file_size: Optional[int] = None) -> tuple[bool, Union[str, dict]]:
+        """
+        验证文件基本属性
+
+        Args:
+            file_data: 文件内容；传入 file_size 时可以只是文件头
+            filename: 文件名
+            file_size: 文件总大小，默认取 len(file_data)
+        """
         if not filename:
             return False, "文件名为空"
 
+        if file_size is None:
+            file_size = len(file_data)
+
+        # 先做廉价的大小检查，超限文件无需再识别 MIME 类型
+        if file_size > self.allowed_size:
+            error_msg = f"文件大小超过限制: {self.allowed_size / 1024 / 1024}MB"
+            logger.error(f"[ERROR] {error_msg}")
+            return False, error_msg
+
         # 获取MIME类型
         mime_type = self._get_mime_type(file_data, filename)
 
         logger.info(f"[INFO] 验证文件: {filename}")
         logger.info(f"   - 检测到的 MIME 类型: {mime_type}")
         logger.info(f"   - 允许的 MIME 类型数量: {len(self.allowed_mimes)}")
-        logger.info(f"   - 文件大小: {len(file_data)} bytes")
+        logger.info(f"   - 文件大小: {file_size} bytes")
 
         if mime_type not in self.allowed_mimes:
             error_msg = f"不支持的文件类型: {mime_type}"
@@ -56,20 +439,24 @@ class FileProcessor:
             logger.error(f"   - 允许的 MIME 类型列表: {list(self.allowed_mimes)[:10]}...")  # 只显示前10个
             return False, error_msg
 
-        file_size = len(file_data)
-        if file_size > self.allowed_size:
-            error_msg = f"文件大小超过限制: {self.allowed_size / 1024 / 1024}MB"
-            logger.error(f"[ERROR] {error_msg}")
-            return False, error_msg
-
         logger.info(f"[OK] 文件验证通过: {filename}")
         return True, {"mime_type": mime_type, "file_size": file_size}
 
+    async def validate_file_async(self, file_data: bytes, filename: str,
+                                  file_size: Optional[int] = None) -> tuple[bool, Union[str, dict]]:
+        """validate_file 的异步版本，在线程池中执行以免 libmagic 调用阻塞事件循环"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.validate_file, file_data, filename, file_size)
+
     def _get_mime_type(self, file_data: bytes, filename: str) -> str:
         """获取文件的MIME类型"""
         try:
             if HAS_MAGIC and magic:
-                mime_type = magic.from_buffer(file_data, mime=True)
+                header = file_data[:MIME_SNIFF_BYTES]
+                mime_type = _sniff_common_mime(header)
+                if mime_type:
+                    return mime_type
+                mime_type = _magic_from_buffer(header)
                 logger.debug(f"[DEBUG] Magic 检测到 MIME 类型: {mime_type} (文件: {filename})")
                 return mime_type
             else:
@@ -167,190 +554,54 @@ class FileProcessor:
 
     @staticmethod
     def _guess_mime_from_extension(filename: str) -> str:
-        """根据扩展名猜测MIME类型"""
-        lower_name = filename.lower()
-        _, ext = os.path.splitext(lower_name)
-
-        # 图片格式
-        image_exts = {
-            '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
-            '.gif': 'image/gif', '.bmp': 'image/bmp', '.webp': 'image/webp',
-            '.svg': 'image/svg+xml', '.tiff': 'image/tiff', '.tif': 'image/tiff'
-        }
-        if ext in image_exts:
-            return image_exts[ext]
-
-        # 视频格式
-        video_exts = {
-            '.mp4': 'video/mp4', '.mov': 'video/quicktime', '.avi': 'video/x-msvideo',
-            '.mkv': 'video/x-matroska', '.flv': 'video/x-flv', '.wmv': 'video/x-ms-wmv',
-            '.webm': 'video/webm', '.m4v': 'video/x-m4v'
-        }
-        if ext in video_exts:
-            return video_exts[ext]
-
-        # 音频格式
-        audio_exts = {
-            '.mp3': 'audio/mpeg', '.wav': 'audio/wav', '.flac': 'audio/flac',
-            '.aac': 'audio/aac', '.ogg': 'audio/ogg', '.oga': 'audio/ogg',
-            '.m4a': 'audio/mp4', '.opus': 'audio/ogg',
-            '.weba': 'audio/webm', '.wma': 'audio/x-ms-wma',
-        }
-        if ext in audio_exts:
-            return audio_exts[ext]
-
-        # 文档格式
-        document_exts = {
-            '.pdf': 'application/pdf',
-            '.doc': 'application/msword',
-            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            '.docm': 'application/vnd.ms-word.document.macroEnabled.12',
-            '.dotx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.template',
-            '.dotm': 'application/vnd.ms-word.template.macroEnabled.12',
-            '.xls': 'application/vnd.ms-excel',
-            '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            '.xlsm': 'application/vnd.ms-excel.sheet.macroEnabled.12',
-            '.xlsb': 'application/vnd.ms-excel.sheet.binary.macroEnabled.12',
-            '.xlt': 'application/vnd.ms-excel',
-            '.xltm': 'application/vnd.ms-excel.template.macroEnabled.12',
-            '.ods': 'application/vnd.oasis.opendocument.spreadsheet',
-            '.fods': 'application/vnd.oasis.opendocument.spreadsheet',
-            '.numbers': 'application/x-iwork-numbers-sffnumbers',
-            '.ppt': 'application/vnd.ms-powerpoint',
-            '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-            '.pptm': 'application/vnd.ms-powerpoint.presentation.macroEnabled.12',
-            '.potx': 'application/vnd.openxmlformats-officedocument.presentationml.template',
-            '.potm': 'application/vnd.ms-powerpoint.template.macroEnabled.12',
-            '.ppsx': 'application/vnd.openxmlformats-officedocument.presentationml.slideshow',
-            '.ppsm': 'application/vnd.ms-powerpoint.slideshow.macroEnabled.12',
-            '.txt': 'text/plain',
-            '.md': 'text/markdown',
-            '.csv': 'text/csv',
-            '.html': 'text/html', '.htm': 'text/html',
-        }
-        if ext in document_exts:
-            return document_exts[ext]
-
-        # 压缩格式
-        archive_exts = {
-            '.zip': 'application/zip', '.zipx': 'application/zip',
-            '.rar': 'application/x-rar-compressed',
-            '.7z': 'application/x-7z-compressed',
-            '.gz': 'application/gzip', '.gzip': 'application/gzip',
-            '.tar': 'application/x-tar',
-            '.bz2': 'application/x-bzip2', '.bzip2': 'application/x-bzip2',
-            '.xz': 'application/x-xz',
-            '.zst': 'application/zstd', '.tzst': 'application/zstd',
-            '.lzma': 'application/x-lzma',
-            '.tgz': 'application/gzip',
-            '.tbz': 'application/x-bzip2', '.tbz2': 'application/x-bzip2',
-            '.txz': 'application/x-xz',
-            '.ar': 'application/x-archive',
-            '.xar': 'application/x-xar',
-            '.cab': 'application/x-cab',
-            '.cpio': 'application/x-cpio',
-            '.iso': 'application/x-iso9660-image',
-            '.lha': 'application/x-lha', '.lzh': 'application/x-lzh',
-            '.jar': 'application/java-archive',
-            '.war': 'application/java-archive',
-            '.ear': 'application/java-archive',
-            '.apk': 'application/vnd.android.package-archive',
-            '.cbz': 'application/zip',
-            '.cbr': 'application/x-rar-compressed',
-        }
-        if ext in archive_exts:
-            return archive_exts[ext]
-
-        # 3D 模型 & CAD
-        cad_3d_exts = {
-            '.glb': 'model/gltf-binary',
-            '.gltf': 'model/gltf+json',
-            '.obj': 'model/obj',
-            '.stl': 'model/stl',
-            '.ply': 'model/ply',
-            '.fbx': 'application/octet-stream',
-            '.dae': 'model/vnd.collada+xml',
-            '.3ds': 'image/x-3ds',
-            '.3mf': 'model/3mf',
-            '.amf': 'application/x-amf',
-            '.usd': 'model/vnd.usd',
-            '.usda': 'model/vnd.usda',
-            '.usdc': 'model/vnd.usdc',
-            '.usdz': 'model/vnd.usdz+zip',
-            '.kmz': 'application/vnd.google-earth.kmz',
-            '.pcd': 'application/octet-stream',
-            '.wrl': 'model/vrml', '.vrml': 'model/vrml',
-            '.xyz': 'chemical/x-xyz',
-            '.vtk': 'application/octet-stream',
-            '.vtp': 'application/octet-stream',
-            '.step': 'application/step', '.stp': 'application/step',
-            '.iges': 'application/iges', '.igs': 'application/iges',
-            '.ifc': 'application/x-ifc',
-            '.3dm': 'model/x-3dm',
-            '.dwg': 'image/vnd.dwg',
-            '.dxf': 'image/vnd.dxf',
-            '.dwf': 'application/dwf',
-            '.dwfx': 'application/dwf',
-            '.xps': 'application/oxps',
-        }
-        if ext in cad_3d_exts:
-            return cad_3d_exts[ext]
-
-        # 代码 & 文本
-        code_exts = {
-            '.json': 'application/json',
-            '.xml': 'application/xml',
-            '.js': 'text/javascript', '.mjs': 'text/javascript', '.cjs': 'text/javascript',
-            '.ts': 'text/typescript', '.tsx': 'text/typescript',
-            '.jsx': 'text/javascript',
-            '.css': 'text/css',
-            '.java': 'text/x-java',
-            '.py': 'text/x-python',
-            '.log': 'text/plain',
-            '.yaml': 'text/yaml', '.yml': 'text/yaml',
-            '.ini': 'text/plain',
-            '.sh': 'application/x-sh', '.bash': 'application/x-sh',
-            '.sql': 'text/x-sql',
-            '.go': 'text/x-go',
-            '.rs': 'text/x-rust',
-            '.php': 'text/x-php',
-            '.c': 'text/x-c', '.cpp': 'text/x-c++', '.cc': 'text/x-c++',
-            '.h': 'text/x-c', '.hpp': 'text/x-c++',
-            '.cs': 'text/x-csharp',
-            '.diff': 'text/x-diff',
-            '.vue': 'text/html',
-        }
-        if ext in code_exts:
-            return code_exts[ext]
-
-        # 电子书 & 邮件 & 其他
-        other_exts = {
-            '.epub': 'application/epub+zip',
-            '.umd': 'application/x-umd-book',
-            '.eml': 'message/rfc822',
-            '.msg': 'application/vnd.ms-outlook',
-            '.ofd': 'application/ofd',
-            '.typ': 'text/typst', '.typst': 'text/typst',
-            '.excalidraw': 'application/x-excalidraw',
-            '.drawio': 'application/x-drawio', '.dio': 'application/x-drawio',
-            '.olb': 'application/octet-stream',
-            '.dra': 'application/octet-stream',
-        }
-        if ext in other_exts:
-            return other_exts[ext]
-
-        # 未知类型，返回通用二进制
-        return 'application/octet-stream'
+        """根据扩展名猜测MIME类型，未知类型返回通用二进制"""
+        _, ext = os.path.splitext(filename)
+        return _EXT_TO_MIME.get(ext.lower(), 'application/octet-stream')
 
     @staticmethod
     def calculate_hash(file_data: bytes) -> str:
         """计算文件哈希"""
         return hashlib.sha256(file_data).hexdigest()
 
+    @staticmethod
+    def calculate_file_hash(fileobj: BinaryIO) -> str:
+        """从文件对象开头分块读取并计算哈希，不把整个文件读入内存"""
+        fileobj.seek(0)
+        hasher = hashlib.sha256()
+        while block := fileobj.read(STREAM_READ_SIZE):
+            hasher.update(block)
+        fileobj.seek(0)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def calculate_hashes(fileobjs: List[BinaryIO]) -> List[str]:
+        """
+        批量计算多个文件对象的哈希
+
+        hashlib 处理大缓冲区时会释放 GIL，因此多个文件可以在线程池中
+        同时占用多个 CPU 核心；文件数较少时直接串行计算。
+        """
+        if len(fileobjs) < PARALLEL_HASH_MIN_FILES:
+            return [FileProcessor.calculate_file_hash(fileobj) for fileobj in fileobjs]
+
+        max_workers = min(len(fileobjs), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(FileProcessor.calculate_file_hash, fileobjs))
+
     @staticmethod
     def save_file(file_hash: str, file_data: bytes, original_filename: str) -> str:
         """保存文件到存储系统"""
-        return s3_storage.save_file(file_hash, file_data, original_filename)
+        return get_s3_storage().save_file(file_hash, file_data, original_filename)
+
+    @staticmethod
+    def save_fileobj(file_hash: str, fileobj: BinaryIO, original_filename: str) -> str:
+        """将文件对象的内容流式写入存储系统"""
+        return get_s3_storage().save_fileobj(file_hash, fileobj, original_filename)
+
+    @staticmethod
+    def save_file_from_path(file_hash: str, source_path: str, original_filename: str) -> str:
+        """将磁盘上的文件移入存储系统（源文件会被移走）"""
+        return get_s3_storage().save_file_from_path(file_hash, source_path, original_filename)
 
     @staticmethod
     async def create_file_hash_record(db: AsyncSession, file_hash: str, filename: str,
@@ -470,7 +721,7 @@ class FileProcessor:
             with tempfile.TemporaryDirectory() as temp_dir:
                 # 下载文件到临时目录
                 local_video_path = os.path.join(temp_dir, os.path.basename(media.filename))
-                file_data = s3_storage.read_file(file_path)
+                file_data = get_s3_storage().read_file(file_path)
 
                 if not file_data:
                     logger.error(f"无法读取视频文件: {file_path}")
@@ -519,7 +770,7 @@ class FileProcessor:
                         thumbnail_data = f.read()
 
                     thumbnail_hash = hashlib.sha256(thumbnail_data).hexdigest()
-                    thumbnail_storage_path = s3_storage.save_file(
+                    thumbnail_storage_path = get_s3_storage().save_file(
                         thumbnail_hash,
                         thumbnail_data,
                         thumbnail_filename
@@ -661,31 +912,71 @@ class ChunkedUploadProcessor:
                                  file_size: int,
                                  db: AsyncSession) -> Optional[dict]:
         """检查文件是否已存在"""
-        stmt = select(FileHash).where(
-            FileHash.hash == file_hash,
-            FileHash.file_size == file_size  # also match size
-        )
-        result = await db.execute(stmt)
-        existing_file = result.scalar_one_or_none()
+        cached = _get_cached_file_hash(file_hash, file_size)
+        row = None
+        if cached:
+            row = await self._reference_existing_file(FileHash.id == cached['id'], file_hash, db)
+            if row is None:
+                _forget_cached_file_hash(file_hash, file_size)
+        if row is None:
+            file_hash_id = (
+                select(FileHash.id)
+                .where(FileHash.hash == file_hash, FileHash.file_size == file_size)  # also match size
+                .limit(1)
+                .scalar_subquery()
+            )
+            row = await self._reference_existing_file(FileHash.id == file_hash_id, file_hash, db)
+            if row is not None:
+                _cache_file_hash(file_hash, file_size, row.id, row.storage_path)
+
+        if row is None:
+            return None
 
-        if existing_file:
+        media_id = row.media_id
+        if media_id is None:
             # 创建媒体记录
             processor = FileProcessor(self.user_id)
-            media_record = await processor.create_media_record(
-                db, file_hash, filename, check_existing=True
-            )
-            existing_file.reference_count += 1
-            await db.commit()
+            media_record = await processor.create_media_record(db, file_hash, filename)
+            media_id = media_record.id
+        await db.commit()
 
-            return {
-                'success': True,
-                'upload_id': str(uuid.uuid4()),
-                'file_exists': True,
-                'file_hash': file_hash,
-                'media_id': media_record.id,
-                'instant': True
-            }
-        return None
+        return {
+            'success': True,
+            'upload_id': str(uuid.uuid4()),
+            'file_exists': True,
+            'file_hash': file_hash,
+            'media_id': media_id,
+            'instant': True
+        }
+
+    async def _reference_existing_file(self, file_hash_filter, file_hash: str,
+                                       db: AsyncSession):
+        """
+        单条语句完成秒传所需的数据库操作
+
+        通过 UPDATE ... RETURNING 的 CTE 同时完成存在性检查和引用计数递增，
+        并在同一语句中查询当前用户是否已有该文件的媒体记录。
+
+        Returns:
+            (id, storage_path, media_id) 行；文件不存在时返回 None
+        """
+        bumped = (
+            update(FileHash)
+            .where(file_hash_filter)
+            .values(reference_count=FileHash.reference_count + 1)
+            .returning(FileHash.id, FileHash.storage_path)
+            .cte('bumped')
+        )
+        media_id = (
+            select(Media.id)
+            .where(Media.user == self.user_id, Media.hash == file_hash)
+            .limit(1)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            select(bumped.c.id, bumped.c.storage_path, media_id.label('media_id'))
+        )
+        return result.first()
 
     async def _find_resumable_task(self, filename: str,
                                    db: AsyncSession) -> Optional[dict]:
@@ -731,22 +1022,21 @@ class ChunkedUploadProcessor:
                 return {'success': False, 'error': '上传任务不存在'}
 
             # 检查分块是否已上传
-            if await self._chunk_exists(upload_id, chunk_index, chunk_hash, db):
-                return {'success': True, 'message': '分块已存在'}
-
-            # 二次检查：防止并发竞态条件（两个请求同时通过上面的检查）
-            from sqlalchemy import select as sa_select
-            existing = await db.execute(
-                sa_select(UploadChunk).where(
-                    UploadChunk.upload_id == upload_id,
-                    UploadChunk.chunk_index == chunk_index
-                )
-            )
-            if existing.scalar_one_or_none():
+            existing_hash = await self._get_chunk_hash(upload_id, chunk_index, db)
+            if existing_hash is not None:
+                # 重传的分块不经过写入时的校验，单独在线程池中校验请求体，损坏的重传不能报告为成功
+                loop = asyncio.get_event_loop()
+                actual_hash = await loop.run_in_executor(None, _sha256_hexdigest, chunk_data)
+                if actual_hash != chunk_hash:
+                    return {'success': False, 'error': f'分块 {chunk_index} 哈希验证失败'}
+                if existing_hash == chunk_hash:
+                    return {'success': True, 'message': '分块已存在'}
                 return {'success': True, 'chunk_index': chunk_index}
 
-            # 保存分块文件
-            chunk_path = await self._save_chunk_file(upload_id, chunk_index, chunk_data)
+            # 保存分块文件（同时校验分块哈希）
+            chunk_path = await self._save_chunk_file(
+                upload_id, chunk_index, chunk_data, expected_hash=chunk_hash
+            )
 
             # 记录分块信息
             chunk_record = UploadChunk(
@@ -765,12 +1055,190 @@ class ChunkedUploadProcessor:
 
             return {'success': True, 'message': '分块上传成功'}
 
+        except IntegrityError:
+            # 并发请求已写入同一分块，由唯一索引 (upload_id, chunk_index) 拦截
+            await db.rollback()
+            return {'success': True, 'chunk_index': chunk_index}
+
         except Exception as e:
             await db.rollback()
 
             logger.error(f"分块上传失败: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    async def upload_chunk_streaming(self, upload_id: str, chunk_index: int,
+                                     chunk_hash: str, stream: AsyncIterator[bytes],
+                                     db: AsyncSession = Depends(get_async_db)) -> dict:
+        """
+        流式上传单个分块
+
+        请求体直接读入缓冲区池中复用的 bytearray，同时计算哈希，
+        不为每个分块分配新的 bytes 对象。
+        """
+        try:
+            task = await self._get_upload_task(upload_id, db)
+            if not task:
+                return {'success': False, 'error': '上传任务不存在'}
+
+            existing = await db.execute(
+                select(UploadChunk.id).where(
+                    UploadChunk.upload_id == upload_id,
+                    UploadChunk.chunk_index == chunk_index
+                )
+            )
+            if existing.first():
+                return {'success': True, 'message': '分块已存在'}
+
+            buffer = _acquire_chunk_buffer(self.chunk_size)
+            try:
+                view = memoryview(buffer)
+                hasher = hashlib.sha256()
+                size = 0
+                async for data in stream:
+                    end = size + len(data)
+                    if end > len(buffer):
+                        return {'success': False, 'error': '分块大小超过限制'}
+                    view[size:end] = data
+                    hasher.update(data)
+                    size = end
+
+                if size == 0:
+                    return {'success': False, 'error': '分块数据为空'}
+                if hasher.hexdigest() != chunk_hash:
+                    return {'success': False, 'error': '分块哈希验证失败'}
+
+                chunk_path = await self._save_chunk_file(upload_id, chunk_index, view[:size])
+            finally:
+                _release_chunk_buffer(buffer)
+
+            db.add(UploadChunk(
+                upload_id=upload_id,
+                chunk_index=chunk_index,
+                chunk_hash=chunk_hash,
+                chunk_size=size,
+                chunk_path=chunk_path
+            ))
+            task.uploaded_chunks += 1
+            task.status = 'uploading'
+            await db.commit()
+
+            return {'success': True, 'message': '分块上传成功'}
+
+        except IntegrityError:
+            # 并发请求已写入同一分块，由唯一索引 (upload_id, chunk_index) 拦截
+            await db.rollback()
+            return {'success': True, 'chunk_index': chunk_index}
+
+        except Exception as e:
+            await db.rollback()
+
+            logger.error(f"分块上传失败: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    async def upload_chunks_bulk(self, upload_id: str,
+                                 chunks: List[Tuple[int, bytes, str]],
+                                 db: AsyncSession = Depends(get_async_db)) -> dict:
+        """
+        批量上传分块
+
+        一次查询过滤已存在的分块，分块文件在线程池中并发写入，
+        所有分块记录与任务进度在同一次提交中保存。提交时遇到并发写入的
+        重复分块视为已上传；任一分块失败或回滚时删除本批次写入的文件。
+
+        Args:
+            upload_id: 上传任务 ID
+            chunks: (chunk_index, chunk_data, chunk_hash) 列表
+            db: 数据库会话
+        """
+        written_paths = []
+        try:
+            task = await self._get_upload_task(upload_id, db)
+            if not task:
+                return {'success': False, 'error': '上传任务不存在'}
+
+            # 一次查询获取已存在的分块，同时去除请求内重复的分块序号
+            indices = {chunk_index for chunk_index, _, _ in chunks}
+            existing_result = await db.execute(
+                select(UploadChunk.chunk_index).where(
+                    UploadChunk.upload_id == upload_id,
+                    UploadChunk.chunk_index.in_(indices)
+                )
+            )
+            seen = set(existing_result.scalars().all())
+            skipped = sorted(seen)
+
+            new_chunks = []
+            for chunk_index, chunk_data, chunk_hash in chunks:
+                if chunk_index in seen:
+                    continue
+                seen.add(chunk_index)
+                new_chunks.append((chunk_index, chunk_data, chunk_hash))
+
+            # 并发校验并写入分块文件，单个分块失败不影响其余分块的结果收集
+            results = await asyncio.gather(*[
+                self._save_chunk_file(upload_id, chunk_index, chunk_data, expected_hash=chunk_hash)
+                for chunk_index, chunk_data, chunk_hash in new_chunks
+            ], return_exceptions=True)
+            written_paths = [path for path in results if isinstance(path, str)]
+            errors = [error for error in results if isinstance(error, BaseException)]
+            if errors:
+                raise errors[0]
+
+            pending = list(zip(new_chunks, results))
+            while True:
+                db.add_all([
+                    UploadChunk(
+                        upload_id=upload_id,
+                        chunk_index=chunk_index,
+                        chunk_hash=chunk_hash,
+                        chunk_size=len(chunk_data),
+                        chunk_path=chunk_path
+                    )
+                    for (chunk_index, chunk_data, chunk_hash), chunk_path in pending
+                ])
+                if pending:
+                    task.uploaded_chunks += len(pending)
+                    task.status = 'uploading'
+                try:
+                    await db.commit()
+                    break
+                except IntegrityError:
+                    # 并发请求已写入部分分块，由唯一索引 (upload_id, chunk_index) 拦截；
+                    # 与单分块上传一致，这些分块视为已上传，其文件属于已提交的记录，不删除
+                    await db.rollback()
+                    duplicate_result = await db.execute(
+                        select(UploadChunk.chunk_index).where(
+                            UploadChunk.upload_id == upload_id,
+                            UploadChunk.chunk_index.in_([item[0][0] for item in pending])
+                        )
+                    )
+                    duplicates = set(duplicate_result.scalars().all())
+                    if not duplicates:
+                        raise
+                    skipped = sorted(set(skipped) | duplicates)
+                    pending = [item for item in pending if item[0][0] not in duplicates]
+                    written_paths = [chunk_path for _, chunk_path in pending]
+                    task = await self._get_upload_task(upload_id, db)
+                    if not task:
+                        raise ValueError('上传任务不存在')
+
+            return {
+                'success': True,
+                'message': '分块批量上传成功',
+                'uploaded': sorted(chunk_index for (chunk_index, _, _), _ in pending),
+                'skipped': skipped
+            }
+
+        except Exception as e:
+            await db.rollback()
+            # 删除本批次写入但未提交的分块文件
+            if written_paths:
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, self._remove_files, written_paths)
+
+            logger.error(f"分块批量上传失败: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
     async def _get_upload_task(self, upload_id: str,
                                db: AsyncSession) -> Optional[UploadTask]:
         """获取上传任务"""
@@ -781,37 +1249,47 @@ class ChunkedUploadProcessor:
         result = await db.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def _chunk_exists(self, upload_id: str, chunk_index: int,
-                            chunk_hash: str, db: AsyncSession) -> bool:
-        """检查分块是否已存在"""
-        stmt = select(UploadChunk).where(
+    async def _get_chunk_hash(self, upload_id: str, chunk_index: int,
+                              db: AsyncSession) -> Optional[str]:
+        """获取已上传分块的哈希，分块不存在时返回 None"""
+        stmt = select(UploadChunk.chunk_hash).where(
             UploadChunk.upload_id == upload_id,
             UploadChunk.chunk_index == chunk_index
         )
         result = await db.execute(stmt)
-        existing = result.scalar_one_or_none()
-
-        return existing is not None and existing.chunk_hash == chunk_hash
+        row = result.first()
+        return row[0] if row else None
 
     async def _save_chunk_file(self, upload_id: str, chunk_index: int,
-                               chunk_data: bytes) -> str:
-        """保存分块文件到磁盘"""
+                               chunk_data: Union[bytes, memoryview],
+                               expected_hash: Optional[str] = None) -> str:
+        """
+        保存分块文件到磁盘
+
+        传入 expected_hash 时，哈希校验与写入在同一次线程池调用中完成，
+        不在事件循环上计算哈希；校验失败时不写入文件并抛出 ValueError。
+        """
         chunk_filename = f"{upload_id}_{chunk_index}.chunk"
         chunk_path = os.path.join(self.temp_dir, chunk_filename)
 
         # 使用异步写入
         loop = asyncio.get_event_loop()
-        await loop.run_in_executor(
-            None, self._write_chunk_file, chunk_path, chunk_data
+        written = await loop.run_in_executor(
+            None, self._write_chunk_file, chunk_path, chunk_data, expected_hash
         )
+        if not written:
+            raise ValueError(f'分块 {chunk_index} 哈希验证失败')
         return chunk_path
 
     @staticmethod
-    def _write_chunk_file(path: str, data: bytes):
-        """同步写入分块文件"""
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+    def _write_chunk_file(path: str, data: Union[bytes, memoryview],
+                          expected_hash: Optional[str] = None) -> bool:
+        """同步校验并写入分块文件（目录已在 __init__ 中创建），校验失败返回 False"""
+        if expected_hash is not None and hashlib.sha256(data).hexdigest() != expected_hash:
+            return False
         with open(path, 'wb') as f:
             f.write(data)
+        return True
 
     async def get_upload_progress(self, upload_id: str,
                                   db: AsyncSession = Depends(get_async_db)) -> dict:
@@ -821,9 +1299,11 @@ class ChunkedUploadProcessor:
             return {'success': False, 'error': '上传任务不存在'}
 
         # 获取已上传分块数量
-        stmt = select(UploadChunk).where(UploadChunk.upload_id == upload_id)
+        stmt = select(func.count()).select_from(UploadChunk).where(
+            UploadChunk.upload_id == upload_id
+        )
         result = await db.execute(stmt)
-        uploaded_chunks = len(result.all())
+        uploaded_chunks = result.scalar_one()
 
         progress = 0
         if task.total_chunks > 0:
@@ -856,13 +1336,16 @@ class ChunkedUploadProcessor:
                 }
 
             # 合并分块并验证
-            merged_data, actual_hash = await self._merge_and_validate_chunks(chunks, file_hash)
+            merged_path, actual_hash = await self._merge_and_validate_chunks(chunks, file_hash)
             if actual_hash != file_hash:
                 return {'success': False, 'error': '文件哈希验证失败'}
 
-            # 保存文件
+            # 保存文件（直接移动合并结果，不读入内存）
             processor = FileProcessor(self.user_id)
-            storage_path = processor.save_file(actual_hash, merged_data, task.filename)
+            loop = asyncio.get_event_loop()
+            storage_path = await loop.run_in_executor(
+                None, processor.save_file_from_path, actual_hash, merged_path, task.filename
+            )
 
             # 创建记录
             await processor.create_file_hash_record(
@@ -899,39 +1382,84 @@ class ChunkedUploadProcessor:
         return list(result.scalars().all())
 
     async def _merge_and_validate_chunks(self, chunks: List[UploadChunk],
-                                         expected_hash: str) -> tuple[bytes, str]:
-        """合并分块并验证哈希"""
+                                         expected_hash: str) -> tuple[str, str]:
+        """
+        合并分块并验证哈希
+
+        Returns:
+            (合并文件路径, 实际哈希)。哈希匹配时由调用方负责移走合并文件，
+            不匹配或合并失败时合并文件会在此处被删除。
+        """
         merged_path = os.path.join(self.temp_dir, f"{chunks[0].upload_id}_merged")
 
-        # 异步合并
+        # 异步合并（合并过程中同步计算哈希）
         loop = asyncio.get_event_loop()
-        await loop.run_in_executor(
-            None, self._merge_chunks_sync, chunks, merged_path
-        )
+        try:
+            actual_hash = await loop.run_in_executor(
+                None, self._merge_chunks_sync, chunks, merged_path
+            )
+        except Exception:
+            if os.path.exists(merged_path):
+                os.remove(merged_path)
+            raise
 
-        # 读取合并后的文件
-        with open(merged_path, 'rb') as f:
-            file_data = f.read()
+        # 哈希不匹配时清理临时文件
+        if actual_hash != expected_hash and os.path.exists(merged_path):
+            os.remove(merged_path)
 
-        # 计算哈希
-        actual_hash = hashlib.sha256(file_data).hexdigest()
+        return merged_path, actual_hash
 
-        # 清理临时文件
-        if os.path.exists(merged_path):
-            os.remove(merged_path)
+    def _merge_chunks_sync(self, chunks: List[UploadChunk], output_path: str) -> str:
+        """
+        同步合并分块，并在合并的同一遍历中流式计算 SHA-256
 
-        return file_data, actual_hash
+        每个分块通过 mmap 映射后喂给哈希器，数据写入则交给内核 sendfile 完成，
+        不经过用户态缓冲区；平台不支持时回退为直接写入映射内容。
+        hashlib 由 OpenSSL 提供实现，在支持 SHA-NI 的 CPU 上会自动使用硬件指令。
 
-    def _merge_chunks_sync(self, chunks: List[UploadChunk], output_path: str):
-        """同步合并分块"""
+        Returns:
+            合并文件的 SHA-256 十六进制摘要
+        """
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        hasher = hashlib.sha256()
 
-        with open(output_path, 'wb') as out_file:
+        with open(output_path, 'wb', buffering=0) as out_file:
             for chunk in chunks:
                 chunk_path = self._resolve_chunk_path(chunk)
-                if os.path.exists(chunk_path):
-                    with open(chunk_path, 'rb') as chunk_file:
-                        shutil.copyfileobj(chunk_file, out_file)
+                with open(chunk_path, 'rb') as chunk_file:
+                    size = os.fstat(chunk_file.fileno()).st_size
+                    if size == 0:
+                        continue
+                    with mmap.mmap(chunk_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        hasher.update(mm)
+                        if not self._sendfile(out_file.fileno(), chunk_file.fileno(), size):
+                            out_file.write(mm)
+
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _sendfile(out_fd: int, in_fd: int, size: int) -> bool:
+        """
+        通过 os.sendfile 在内核中完成文件到文件的复制
+
+        Returns:
+            是否完成复制；平台不支持文件间 sendfile 时返回 False 由调用方回退
+        """
+        if not hasattr(os, 'sendfile'):
+            return False
+
+        offset = 0
+        while offset < size:
+            try:
+                sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+            except OSError:
+                if offset == 0:
+                    return False
+                raise
+            if sent == 0:
+                raise IOError(f"分块文件在合并过程中被截断: 期望 {size} 字节，实际 {offset} 字节")
+            offset += sent
+        return True
 
     def _resolve_chunk_path(self, chunk: UploadChunk) -> str:
         """解析分块文件路径"""
@@ -949,12 +1477,28 @@ class ChunkedUploadProcessor:
         raise FileNotFoundError(f"分块文件不存在: {chunk.chunk_path}")
 
     async def _cleanup_chunks(self, chunks: List[UploadChunk], db: AsyncSession):
-        """清理分块文件和记录"""
-        for chunk in chunks:
-            chunk_path = self._resolve_chunk_path(chunk)
-            if os.path.exists(chunk_path):
-                os.remove(chunk_path)
-            await db.delete(chunk)
+        """清理分块文件和记录：文件在线程池中批量删除，记录用一条 DELETE 删除"""
+        if not chunks:
+            return
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self._remove_chunk_files, chunks)
+        await db.execute(
+            delete(UploadChunk).where(UploadChunk.id.in_([chunk.id for chunk in chunks]))
+        )
+
+    def _remove_chunk_files(self, chunks: List[UploadChunk]):
+        """同步删除分块文件，已不存在的文件直接跳过"""
+        self._remove_files([self._resolve_chunk_path(chunk) for chunk in chunks])
+
+    @staticmethod
+    def _remove_files(paths: List[str]):
+        """同步删除文件列表，已不存在的文件直接跳过"""
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
 
     async def get_uploaded_chunks(self, upload_id: str,
                                   db: AsyncSession = Depends(get_async_db)) -> dict:
@@ -1012,7 +1556,7 @@ async def process_single_file(processor: FileProcessor, file_data: bytes,
     """处理单个文件上传"""
     try:
         # 验证文件
-        is_valid, validation_result = processor.validate_file(file_data, filename)
+        is_valid, validation_result = await processor.validate_file_async(file_data, filename)
         if not is_valid:
             return {'success': False, 'error': validation_result}
 
@@ -1086,6 +1630,15 @@ async def process_single_file(processor: FileProcessor, file_data: bytes,
         return {'success': False, 'error': str(e)}
 
 
+def _get_upload_size(file: UploadFile) -> int:
+    """获取上传文件大小（定位到末尾，不读取内容）"""
+    if getattr(file, 'size', None) is not None:
+        return file.size
+    size = file.file.seek(0, os.SEEK_END)
+    file.file.seek(0)
+    return size
+
+
 async def process_multiple_files(files: List[UploadFile], user_id: int,
                                  allowed_size: int, allowed_mimes: set,
                                  check_existing: bool = True,
@@ -1096,12 +1649,19 @@ async def process_multiple_files(files: List[UploadFile], user_id: int,
     reused_count = 0
     errors = []
 
-    # 收集文件信息
+    # 收集文件信息（只读取文件头做校验，文件内容保留在 UploadFile 的临时文件中）
     file_info_list = []
     for file in files:
         try:
-            file_data = await file.read()
-            is_valid, validation_result = processor.validate_file(file_data, file.filename)
+            file_size = _get_upload_size(file)
+            # 超限文件不读取内容；SVG 需要完整内容做安全检查，其余类型只需文件头
+            if file_size > processor.allowed_size:
+                sample = b''
+            elif (file.filename or '').lower().endswith('.svg'):
+                sample = await file.read()
+            else:
+                sample = await file.read(MIME_SNIFF_BYTES)
+            is_valid, validation_result = await processor.validate_file_async(sample, file.filename, file_size)
 
             if not is_valid:
                 errors.append(f'File {file.filename}: {validation_result}')
@@ -1109,8 +1669,7 @@ async def process_multiple_files(files: List[UploadFile], user_id: int,
 
             file_info = {
                 'filename': file.filename,
-                'file_data': file_data,
-                'file_hash': processor.calculate_hash(file_data),
+                'fileobj': file.file,
                 **validation_result
             }
             file_info_list.append(file_info)
@@ -1118,32 +1677,73 @@ async def process_multiple_files(files: List[UploadFile], user_id: int,
         except Exception as e:
             errors.append(f'Error processing file {file.filename}: {str(e)}')
 
+    # 批量流式计算哈希（在线程池中执行，避免阻塞事件循环）
+    loop = asyncio.get_event_loop()
+    file_hashes = await loop.run_in_executor(
+        None, processor.calculate_hashes, [info['fileobj'] for info in file_info_list]
+    )
+    for file_info, file_hash in zip(file_info_list, file_hashes):
+        file_info['file_hash'] = file_hash
+
     # 按哈希分组处理
     hash_groups = {}
     for file_info in file_info_list:
         hash_groups.setdefault(file_info['file_hash'], []).append(file_info)
 
+    # 一次 MGET 读取所有分组的 FileHash 缓存，命中的分组用一条 UPDATE 批量增加引用计数
+    group_keys = {
+        file_hash: (file_hash, file_group[0].get('file_size', 0))
+        for file_hash, file_group in hash_groups.items()
+    }
+    cached_hashes = _get_cached_file_hashes(list(group_keys.values()))
+    bumped_keys = await _bump_cached_file_hashes(db, {
+        key: (cached['id'], len(hash_groups[key[0]]))
+        for key, cached in cached_hashes.items()
+    })
+    bumped_hashes = {key[0] for key in bumped_keys}
+    # 批量递增尚未随任一分组提交；在此之前回滚会一并撤销
+    bumps_pending = bool(bumped_hashes)
+
+    # 缓存未命中（或缓存记录已失效）的哈希用一次 IN 查询批量获取，代替逐组 SELECT
+    preloaded_hashes = set(hash_groups) - bumped_hashes
+    preloaded_records = {}
+    if preloaded_hashes:
+        result = await db.execute(select(FileHash).where(FileHash.hash.in_(preloaded_hashes)))
+        preloaded_records = {
+            (record.hash, record.file_size): record for record in result.scalars().all()
+        }
+
     # 处理每个哈希组
     for file_hash, file_group in hash_groups.items():
         try:
             first_file = file_group[0]
 
-            # 检查文件是否已存在
+            # 检查文件是否已存在（缓存命中的分组已批量递增，其次使用批量查询结果）
             first_file_size = first_file.get('file_size', 0)
-            stmt = select(FileHash).where(
-                FileHash.hash == file_hash,
-                FileHash.file_size == first_file_size  # also match size
-            )
-            result = await db.execute(stmt)
-            existing_file = result.scalar_one_or_none()
-
-            if existing_file:
-                existing_file.reference_count += len(file_group)
+            exists = file_hash in bumped_hashes
+            if not exists:
+                if file_hash in preloaded_hashes:
+                    existing_file = preloaded_records.get((file_hash, first_file_size))
+                else:
+                    stmt = select(FileHash).where(
+                        FileHash.hash == file_hash,
+                        FileHash.file_size == first_file_size  # also match size
+                    )
+                    result = await db.execute(stmt)
+                    existing_file = result.scalar_one_or_none()
+                if existing_file:
+                    existing_file.reference_count += len(file_group)
+                    _cache_file_hash(existing_file.hash, existing_file.file_size,
+                                     existing_file.id, existing_file.storage_path)
+                    exists = True
+
+            if exists:
                 reused_count += len(file_group)
             else:
                 # 保存新文件
-                storage_path = processor.save_file(
-                    file_hash, first_file['file_data'], first_file['filename']
+                storage_path = await loop.run_in_executor(
+                    None, processor.save_fileobj,
+                    file_hash, first_file['fileobj'], first_file['filename']
                 )
                 await processor.create_file_hash_record(
                     db, file_hash, first_file['filename'],
@@ -1159,9 +1759,22 @@ async def process_multiple_files(files: List[UploadFile], user_id: int,
                 uploaded_files.append(file_info['filename'])
 
             await db.commit()
+            bumps_pending = False
 
         except Exception as e:
             await db.rollback()
+            # 回滚后预加载的对象已过期，后续分组改为逐个查询
+            preloaded_hashes.clear()
+            preloaded_records.clear()
+            if bumps_pending:
+                # 批量递增随回滚撤销，后续分组改为逐个查询后递增
+                bumped_hashes.clear()
+                bumps_pending = False
+            elif file_hash in bumped_hashes:
+                # 该分组的递增已随之前的分组提交，撤销本分组未用上的引用
+                await _release_file_hash_references(
+                    db, cached_hashes[group_keys[file_hash]]['id'], len(file_group)
+                )
             errors.append(f'Error processing files with hash {file_hash}: {str(e)}')
 
     # 构建响应
@@ -8,15 +8,20 @@
   - Comment: 评论
   - Category: 分类（层级关系）
   - Media: 媒体文件
+  - UploadChunk: 上传分块（(upload_id, chunk_index) 唯一索引及其迁移）
 
 使用 SQLite 内存数据库，不依赖 PostgreSQL。
 """
 
 import datetime
+import importlib.util
+import io
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, sessionmaker
 
 from shared.models.article import Article, ArticleContent
@@ -24,6 +29,7 @@ from shared.models.user import User
 from shared.models.comment import Comment
 from shared.models.category import Category
 from shared.models.media import Media
+from shared.models.media.upload_chunk import UploadChunk
 
 
 # ============================================================================
@@ -280,3 +286,66 @@ class TestMediaModel:
         session.add(m)
         session.flush()
         assert m.mime_type.startswith("image/")
+
+
+# ============================================================================
+# UploadChunk 模型
+# ============================================================================
+
+UPLOAD_CHUNK_MIGRATION = (
+    Path(__file__).resolve().parent.parent
+    / "alembic_migrations" / "versions" / "7c4a2998315c_upload_chunk_index.py"
+)
+
+
+def _migration_sql(func_name: str) -> str:
+    """以离线模式执行迁移函数，返回生成的 PostgreSQL 语句"""
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    spec = importlib.util.spec_from_file_location("upload_chunk_index_migration", UPLOAD_CHUNK_MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    buffer = io.StringIO()
+    context = MigrationContext.configure(
+        dialect_name="postgresql", opts={"as_sql": True, "output_buffer": buffer}
+    )
+    with Operations.context(context):
+        getattr(migration, func_name)()
+    return " ".join(buffer.getvalue().split())
+
+
+class TestUploadChunkModel:
+    """上传分块模型：同一上传任务的分块序号唯一"""
+
+    def test_duplicate_chunk_index_rejected(self):
+        """(upload_id, chunk_index) 重复时由唯一索引拦截（只建 upload_chunks 表，不触发其他映射器）"""
+        table = UploadChunk.__table__
+        e = create_engine("sqlite:///:memory:", echo=False)
+        table.create(e)
+
+        with e.begin() as conn:
+            conn.execute(insert(table), [
+                {"id": 1, "upload_id": "u1", "chunk_index": 0, "chunk_size": 10},
+                {"id": 2, "upload_id": "u1", "chunk_index": 1, "chunk_size": 10},
+                {"id": 3, "upload_id": "u2", "chunk_index": 0, "chunk_size": 10},
+            ])
+
+        with pytest.raises(IntegrityError):
+            with e.begin() as conn:
+                conn.execute(insert(table).values(id=4, upload_id="u1", chunk_index=0, chunk_size=10))
+
+    def test_migration_dedupes_before_creating_index(self):
+        """迁移先删除重复分块（保留最早的一行），再创建唯一索引"""
+        sql = _migration_sql("upgrade")
+
+        delete_at = sql.index("DELETE FROM upload_chunks a USING upload_chunks b")
+        create_at = sql.index(
+            "CREATE UNIQUE INDEX idx_upload_chunks_upload_chunk ON upload_chunks (upload_id, chunk_index)"
+        )
+        assert delete_at < create_at
+        assert "a.id > b.id" in sql
+
+    def test_migration_downgrade_drops_index(self):
+        assert "DROP INDEX idx_upload_chunks_upload_chunk" in _migration_sql("downgrade")
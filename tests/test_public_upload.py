@@ -0,0 +1,523 @@
+# -*- coding: utf-8 -*-
+"""src/utils/upload/public_upload.py 分块上传单元测试"""
+import hashlib
+import io
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+
+import src.utils.upload.public_upload as upload_module
+from shared.models import FileHash, UploadChunk, UploadTask
+from src.utils.upload.public_upload import ChunkedUploadProcessor, FileProcessor, process_multiple_files
+
+
+class _FakeResult:
+    def __init__(self, values):
+        self._values = list(values)
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self._values)
+
+    def scalar_one_or_none(self):
+        return self._values[0] if self._values else None
+
+    def first(self):
+        return (self._values[0],) if self._values else None
+
+
+class _FakeSession:
+    """模拟 AsyncSession：记录提交的分块，conflicts 中的序号在首次提交时触发唯一索引冲突"""
+
+    def __init__(self, task, existing=(), conflicts=()):
+        self.task = task
+        self.existing = set(existing)
+        self.conflicts = set(conflicts)
+        self.added = []
+        self.committed = []
+        self.rollbacks = 0
+        self._committed_count = task.uploaded_chunks
+
+    async def execute(self, stmt):
+        if stmt.column_descriptions[0]['entity'] is UploadTask:
+            return _FakeResult([self.task])
+        return _FakeResult(sorted(self.existing))
+
+    def add(self, record):
+        self.added.append(record)
+
+    def add_all(self, records):
+        self.added.extend(records)
+
+    async def commit(self):
+        indices = {record.chunk_index for record in self.added}
+        if indices & self.conflicts:
+            # 模拟并发请求抢先提交了这些分块
+            self.existing |= self.conflicts
+            self.conflicts = set()
+            raise IntegrityError("INSERT INTO upload_chunks", {}, Exception("duplicate key"))
+        self.committed.extend(self.added)
+        self.existing |= indices
+        self.added = []
+        self._committed_count = self.task.uploaded_chunks
+
+    async def rollback(self):
+        self.added = []
+        self.rollbacks += 1
+        self.task.uploaded_chunks = self._committed_count
+
+
+def _chunk(index, data):
+    return index, data, hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return ChunkedUploadProcessor(user_id=1)
+
+
+@pytest.fixture
+def task():
+    return SimpleNamespace(uploaded_chunks=0, status='pending')
+
+
+@pytest.mark.unit
+class TestUploadChunksBulk:
+    """测试批量分块上传"""
+
+    @pytest.mark.asyncio
+    async def test_uploads_new_and_skips_existing(self, processor, task):
+        db = _FakeSession(task, existing={0})
+        chunks = [_chunk(0, b'a' * 16), _chunk(1, b'b' * 16), _chunk(2, b'c' * 16), _chunk(1, b'b' * 16)]
+
+        result = await processor.upload_chunks_bulk('u1', chunks, db=db)
+
+        assert result['success'] is True
+        assert result['uploaded'] == [1, 2]
+        assert result['skipped'] == [0]
+        assert task.uploaded_chunks == 2
+        assert task.status == 'uploading'
+        assert sorted(record.chunk_index for record in db.committed) == [1, 2]
+        with open(os.path.join(processor.temp_dir, 'u1_2.chunk'), 'rb') as f:
+            assert f.read() == b'c' * 16
+
+    @pytest.mark.asyncio
+    async def test_hash_mismatch_removes_written_files(self, processor, task):
+        db = _FakeSession(task)
+        bad = (1, b'tampered', hashlib.sha256(b'original').hexdigest())
+        chunks = [_chunk(0, b'a' * 16), bad, _chunk(2, b'c' * 16)]
+
+        result = await processor.upload_chunks_bulk('u1', chunks, db=db)
+
+        assert result['success'] is False
+        assert '哈希验证失败' in result['error']
+        assert db.rollbacks == 1
+        assert db.committed == []
+        assert task.uploaded_chunks == 0
+        assert os.listdir(processor.temp_dir) == []
+
+    @pytest.mark.asyncio
+    async def test_duplicate_on_commit_treated_as_uploaded(self, processor, task):
+        db = _FakeSession(task, conflicts={1})
+        chunks = [_chunk(0, b'a' * 16), _chunk(1, b'b' * 16), _chunk(2, b'c' * 16)]
+
+        result = await processor.upload_chunks_bulk('u1', chunks, db=db)
+
+        assert result['success'] is True
+        assert result['uploaded'] == [0, 2]
+        assert result['skipped'] == [1]
+        assert db.rollbacks == 1
+        assert task.uploaded_chunks == 2
+        assert sorted(record.chunk_index for record in db.committed) == [0, 2]
+        # 重复分块的文件属于已提交的记录，不能被删除
+        assert sorted(os.listdir(processor.temp_dir)) == ['u1_0.chunk', 'u1_1.chunk', 'u1_2.chunk']
+
+    @pytest.mark.asyncio
+    async def test_commit_failure_removes_written_files(self, processor, task):
+        db = _FakeSession(task)
+
+        async def failing_commit():
+            raise RuntimeError('connection lost')
+
+        db.commit = failing_commit
+        result = await processor.upload_chunks_bulk('u1', [_chunk(0, b'a' * 16), _chunk(1, b'b' * 16)], db=db)
+
+        assert result['success'] is False
+        assert db.rollbacks == 1
+        assert os.listdir(processor.temp_dir) == []
+
+
+@pytest.mark.unit
+class TestUploadChunk:
+    """测试单分块上传的哈希校验"""
+
+    @pytest.mark.asyncio
+    async def test_corrupt_body_rejected(self, processor, task):
+        db = _FakeSession(task)
+
+        result = await processor.upload_chunk(
+            'u1', 0, b'corrupted', hashlib.sha256(b'original').hexdigest(), db=db
+        )
+
+        assert result == {'success': False, 'error': '分块 0 哈希验证失败'}
+        assert db.committed == []
+        assert os.listdir(processor.temp_dir) == []
+
+    @pytest.mark.asyncio
+    async def test_corrupt_retransmission_of_existing_chunk_rejected(self, processor, task):
+        """分块已存在时仍校验请求体，损坏的重传不能报告为成功"""
+        stored_hash = hashlib.sha256(b'original').hexdigest()
+        # 查询分块哈希时返回已存储的哈希
+        db = _FakeSession(task, existing={stored_hash})
+
+        corrupt = await processor.upload_chunk('u1', 0, b'corrupted', 'f' * 64, db=db)
+        assert corrupt == {'success': False, 'error': '分块 0 哈希验证失败'}
+
+        tampered = await processor.upload_chunk('u1', 0, b'corrupted', stored_hash, db=db)
+        assert tampered['success'] is False
+
+        retry = await processor.upload_chunk('u1', 0, b'original', stored_hash, db=db)
+        assert retry == {'success': True, 'message': '分块已存在'}
+        assert db.committed == []
+
+
+async def _stream(*parts):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.unit
+class TestUploadChunkStreaming:
+    """测试流式分块上传"""
+
+    @pytest.mark.asyncio
+    async def test_stream_written_and_recorded(self, processor, task):
+        db = _FakeSession(task)
+        data = b'x' * 300 + b'y' * 200
+
+        result = await processor.upload_chunk_streaming(
+            'u1', 3, hashlib.sha256(data).hexdigest(), _stream(data[:300], data[300:]), db=db
+        )
+
+        assert result['success'] is True
+        assert [(record.chunk_index, record.chunk_size) for record in db.committed] == [(3, 500)]
+        assert task.uploaded_chunks == 1
+        with open(os.path.join(processor.temp_dir, 'u1_3.chunk'), 'rb') as f:
+            assert f.read() == data
+
+    @pytest.mark.asyncio
+    async def test_oversized_stream_rejected_and_buffer_reused(self, tmp_path, monkeypatch, task):
+        monkeypatch.chdir(tmp_path)
+        processor = ChunkedUploadProcessor(user_id=1, chunk_size=64)
+        monkeypatch.setattr(upload_module, '_chunk_buffer_pool', upload_module.queue.LifoQueue(maxsize=2))
+        db = _FakeSession(task)
+
+        result = await processor.upload_chunk_streaming(
+            'u1', 0, 'ignored', _stream(b'a' * 40, b'b' * 40), db=db
+        )
+
+        assert result == {'success': False, 'error': '分块大小超过限制'}
+        assert os.listdir(processor.temp_dir) == []
+        # 缓冲区在失败路径上也归还到池中，下一次上传直接复用
+        assert upload_module._chunk_buffer_pool.qsize() == 1
+        pooled = upload_module._chunk_buffer_pool.queue[0]
+        assert upload_module._acquire_chunk_buffer(64) is pooled
+
+    @pytest.mark.asyncio
+    async def test_hash_mismatch_not_written(self, processor, task):
+        db = _FakeSession(task)
+
+        result = await processor.upload_chunk_streaming(
+            'u1', 0, hashlib.sha256(b'expected').hexdigest(), _stream(b'actual'), db=db
+        )
+
+        assert result == {'success': False, 'error': '分块哈希验证失败'}
+        assert db.committed == []
+        assert os.listdir(processor.temp_dir) == []
+
+    @pytest.mark.asyncio
+    async def test_duplicate_on_commit_treated_as_uploaded(self, processor, task):
+        db = _FakeSession(task, conflicts={2})
+        data = b'z' * 32
+
+        result = await processor.upload_chunk_streaming(
+            'u1', 2, hashlib.sha256(data).hexdigest(), _stream(data), db=db
+        )
+
+        assert result == {'success': True, 'chunk_index': 2}
+        assert db.rollbacks == 1
+
+
+@pytest.mark.unit
+class TestReferenceExistingFile:
+    """测试秒传时的单语句引用计数递增"""
+
+    @pytest.mark.asyncio
+    async def test_single_update_returning_cte(self, processor):
+        statements = []
+
+        class _Recorder:
+            async def execute(self, stmt):
+                statements.append(stmt)
+                return _FakeResult([(7, 'objects/ab/cd', 42)])
+
+        row = await processor._reference_existing_file(
+            FileHash.hash == 'abc', 'abc', _Recorder()
+        )
+
+        assert row == ((7, 'objects/ab/cd', 42),)
+        assert len(statements) == 1
+        sql = ' '.join(str(statements[0].compile(dialect=postgresql.dialect())).split())
+        assert sql.startswith('WITH bumped AS (UPDATE file_hashs SET reference_count=(file_hashs.reference_count +')
+        assert 'RETURNING file_hashs.id, file_hashs.storage_path' in sql
+        assert 'FROM media' in sql and 'LIMIT' in sql
+        assert sql.endswith('FROM bumped')
+
+
+def _write_chunks(processor, parts):
+    chunks = []
+    for index, data in enumerate(parts):
+        path = os.path.join(processor.temp_dir, f'u1_{index}.chunk')
+        with open(path, 'wb') as f:
+            f.write(data)
+        chunks.append(UploadChunk(upload_id='u1', chunk_index=index, chunk_path=path, chunk_size=len(data)))
+    return chunks
+
+
+@pytest.mark.unit
+class TestMergeChunks:
+    """测试 mmap + sendfile 分块合并"""
+
+    PARTS = [os.urandom(70000), b'', os.urandom(1), os.urandom(300000)]
+
+    def test_merge_matches_concatenation(self, processor, tmp_path):
+        chunks = _write_chunks(processor, self.PARTS)
+        output = str(tmp_path / 'out' / 'merged')
+
+        digest = processor._merge_chunks_sync(chunks, output)
+
+        expected = b''.join(self.PARTS)
+        with open(output, 'rb') as f:
+            assert f.read() == expected
+        assert digest == hashlib.sha256(expected).hexdigest()
+
+    def test_merge_falls_back_without_sendfile(self, processor, tmp_path, monkeypatch):
+        monkeypatch.setattr(ChunkedUploadProcessor, '_sendfile', staticmethod(lambda out_fd, in_fd, size: False))
+        chunks = _write_chunks(processor, self.PARTS)
+        output = str(tmp_path / 'merged')
+
+        digest = processor._merge_chunks_sync(chunks, output)
+
+        expected = b''.join(self.PARTS)
+        with open(output, 'rb') as f:
+            assert f.read() == expected
+        assert digest == hashlib.sha256(expected).hexdigest()
+
+    def test_sendfile_unsupported_returns_false(self, tmp_path, monkeypatch):
+        def unsupported(*args):
+            raise OSError(22, 'Invalid argument')
+
+        monkeypatch.setattr(os, 'sendfile', unsupported, raising=False)
+        src = tmp_path / 'src'
+        src.write_bytes(b'data')
+        with open(src, 'rb') as fin, open(tmp_path / 'dst', 'wb') as fout:
+            assert ChunkedUploadProcessor._sendfile(fout.fileno(), fin.fileno(), 4) is False
+
+    def test_sendfile_detects_truncated_chunk(self, tmp_path):
+        if not hasattr(os, 'sendfile'):
+            pytest.skip('平台不支持 os.sendfile')
+        src = tmp_path / 'src'
+        src.write_bytes(b'data')
+        with open(src, 'rb') as fin, open(tmp_path / 'dst', 'wb') as fout:
+            with pytest.raises(IOError):
+                ChunkedUploadProcessor._sendfile(fout.fileno(), fin.fileno(), 10)
+
+    @pytest.mark.asyncio
+    async def test_hash_mismatch_removes_merged_file(self, processor):
+        chunks = _write_chunks(processor, [b'abc', b'def'])
+
+        merged_path, actual = await processor._merge_and_validate_chunks(chunks, 'not-the-hash')
+
+        assert actual == hashlib.sha256(b'abcdef').hexdigest()
+        assert not os.path.exists(merged_path)
+
+
+class _FakeCache:
+    """记录调用的缓存；as_dict 为 True 时 mget 按内存缓存的方式返回字典"""
+
+    def __init__(self, data=None, as_dict=False):
+        self.data = dict(data or {})
+        self.as_dict = as_dict
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(('get', key))
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.calls.append(('mget', tuple(keys)))
+        if self.as_dict:
+            return {key: self.data.get(key) for key in keys}
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.calls.append(('set', key))
+        self.data[key] = value
+
+    def delete(self, key):
+        self.calls.append(('delete', key))
+        self.data.pop(key, None)
+
+
+class _SqliteSession:
+    """把 FileHash 表建在 SQLite 内存库中，以异步会话的接口包装同步 Session"""
+
+    def __init__(self, rows):
+        engine = create_engine('sqlite:///:memory:')
+        FileHash.__table__.create(engine)
+        self.session = Session(engine)
+        self.session.execute(insert(FileHash.__table__), rows)
+        self.session.commit()
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return self.session.execute(stmt)
+
+    async def commit(self):
+        self.session.commit()
+
+    async def rollback(self):
+        self.session.rollback()
+
+    def reference_counts(self):
+        table = FileHash.__table__
+        return dict(self.session.execute(select(table.c.id, table.c.reference_count)).all())
+
+
+def _cached(file_id):
+    return json.dumps({'id': file_id, 'storage_path': f'objects/{file_id}'})
+
+
+@pytest.mark.unit
+class TestFileHashCache:
+    """测试 FileHash 存在性缓存的批量读取与批量递增"""
+
+    @pytest.mark.parametrize('as_dict', [False, True])
+    def test_single_mget_for_all_keys(self, monkeypatch, as_dict):
+        fake = _FakeCache({'fh:a:1': _cached(1), 'fh:c:3': 'not json'}, as_dict=as_dict)
+        monkeypatch.setattr(upload_module, 'cache', fake)
+
+        cached = upload_module._get_cached_file_hashes([('a', 1), ('b', 2), ('c', 3)])
+
+        assert cached == {('a', 1): {'id': 1, 'storage_path': 'objects/1'}}
+        assert fake.calls == [('mget', ('fh:a:1', 'fh:b:2', 'fh:c:3'))]
+
+    def test_cache_unavailable_returns_empty(self, monkeypatch):
+        class _Down:
+            def mget(self, keys):
+                raise ConnectionError('redis down')
+
+        monkeypatch.setattr(upload_module, 'cache', _Down())
+        assert upload_module._get_cached_file_hashes([('a', 1)]) == {}
+
+    @pytest.mark.asyncio
+    async def test_bump_in_one_update_and_forget_stale(self, monkeypatch):
+        fake = _FakeCache({'fh:gone:3': _cached(9)})
+        monkeypatch.setattr(upload_module, 'cache', fake)
+        db = _SqliteSession([
+            {'id': 1, 'hash': 'a', 'file_size': 1, 'reference_count': 1},
+            {'id': 2, 'hash': 'b', 'file_size': 2, 'reference_count': 5},
+        ])
+
+        bumped = await upload_module._bump_cached_file_hashes(
+            db, {('a', 1): (1, 3), ('b', 2): (2, 1), ('gone', 3): (9, 2)}
+        )
+
+        assert bumped == {('a', 1), ('b', 2)}
+        assert db.reference_counts() == {1: 4, 2: 6}
+        assert len(db.statements) == 1
+        assert ('delete', 'fh:gone:3') in fake.calls
+
+    @pytest.fixture
+    def two_cached_files(self, monkeypatch):
+        """两个内容不同且都命中缓存的文件；fail_on 中的文件名创建媒体记录时抛出异常"""
+        first, second = b'first file', b'second file'
+        hash_a, hash_b = (hashlib.sha256(data).hexdigest() for data in (first, second))
+        fake = _FakeCache({
+            f'fh:{hash_a}:{len(first)}': _cached(1),
+            f'fh:{hash_b}:{len(second)}': _cached(2),
+        })
+        monkeypatch.setattr(upload_module, 'cache', fake)
+        db = _SqliteSession([
+            {'id': 1, 'hash': hash_a, 'file_size': len(first), 'reference_count': 1},
+            {'id': 2, 'hash': hash_b, 'file_size': len(second), 'reference_count': 1},
+        ])
+        media, fail_on = [], set()
+
+        async def validate(self, sample, filename, file_size=None):
+            return True, {'file_size': file_size, 'mime_type': 'image/png'}
+
+        async def create_media(self, db, file_hash, filename, check_existing=False):
+            if filename in fail_on:
+                raise RuntimeError('insert failed')
+            media.append((file_hash, filename))
+
+        monkeypatch.setattr(FileProcessor, 'validate_file_async', validate)
+        monkeypatch.setattr(FileProcessor, 'create_media_record', create_media)
+
+        def make_files():
+            return [
+                UploadFile(io.BytesIO(first), filename='a1.png', size=len(first)),
+                UploadFile(io.BytesIO(first), filename='a2.png', size=len(first)),
+                UploadFile(io.BytesIO(second), filename='b.png', size=len(second)),
+            ]
+
+        return SimpleNamespace(cache=fake, db=db, media=media, fail_on=fail_on, make_files=make_files)
+
+    @pytest.mark.asyncio
+    async def test_process_multiple_files_batches_cache_hits(self, two_cached_files):
+        """所有分组命中缓存时：一次 MGET、一条 UPDATE，不再逐组读缓存或查询"""
+        ctx = two_cached_files
+
+        response, status = await process_multiple_files(ctx.make_files(), 1, 1024, {'image/png'}, db=ctx.db)
+
+        assert status == 200
+        assert response['reused'] == 3
+        assert len(ctx.media) == 3
+        assert [call[0] for call in ctx.cache.calls] == ['mget']
+        assert len(ctx.db.statements) == 1
+        assert ctx.db.reference_counts() == {1: 3, 2: 2}
+
+    @pytest.mark.asyncio
+    async def test_failed_group_after_commit_releases_its_references(self, two_cached_files):
+        """批量递增已随前一分组提交后，失败分组的引用被撤销"""
+        ctx = two_cached_files
+        ctx.fail_on.add('b.png')
+
+        response, status = await process_multiple_files(ctx.make_files(), 1, 1024, {'image/png'}, db=ctx.db)
+
+        assert status == 207
+        assert ctx.db.reference_counts() == {1: 3, 2: 1}
+
+    @pytest.mark.asyncio
+    async def test_failed_first_group_rolls_back_batch_bump(self, two_cached_files):
+        """第一个分组失败时批量递增随回滚撤销，其余分组改为逐个查询后递增"""
+        ctx = two_cached_files
+        ctx.fail_on.add('a1.png')
+
+        response, status = await process_multiple_files(ctx.make_files(), 1, 1024, {'image/png'}, db=ctx.db)
+
+        assert status == 207
+        assert response['uploaded'] == ['b.png']
+        assert ctx.db.reference_counts() == {1: 1, 2: 2}
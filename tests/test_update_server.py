@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""update_server/server.py 版本信息快照接口单元测试"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import shared.utils.version_manager as vm_module
+import update_server.server as server_module
+
+
+def _write_version(path, version, migration="abc123"):
+    path.write_text(json.dumps({
+        "release": {"version": version, "build_time": "2026-01-01T00:00:00"},
+        "database": {"migration": migration, "status": "up_to_date"},
+    }), encoding="utf-8")
+
+
+@pytest.fixture
+def version_file(tmp_path, monkeypatch):
+    path = tmp_path / "version.txt"
+    _write_version(path, "1.2.3")
+    monkeypatch.setattr(server_module.update_checker, "version_file", path)
+    monkeypatch.setattr(server_module.update_checker, "_snapshot", None)
+    vm_module._PARSE_CACHE.clear()
+    yield path
+    vm_module._PARSE_CACHE.clear()
+
+
+@pytest.fixture
+def manager_loads(monkeypatch):
+    """统计 VersionManager 的构造次数，即 version.txt 的实际加载次数"""
+    loads = []
+    original = server_module.VersionManager
+
+    def counting(*args, **kwargs):
+        loads.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(server_module, "VersionManager", counting)
+    return loads
+
+
+@pytest.fixture
+def client():
+    return TestClient(server_module.app)
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(not server_module.VERSION_MANAGER_AVAILABLE, reason="版本管理器不可用")
+class TestVersionSnapshot:
+    """测试 /api/v1/version/all 及版本快照缓存"""
+
+    def test_all_endpoint_returns_every_section(self, version_file, client):
+        response = client.get("/api/v1/version/all")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["frontend"]["version"] == "1.2.3"
+        assert data["backend"]["version"] == "1.2.3"
+        assert data["database"]["migration"] == "abc123"
+        assert "timestamp" in data
+
+    def test_snapshot_shared_across_endpoints(self, version_file, manager_loads, client):
+        """version.txt 未变化时各接口共用一份快照，只加载一次"""
+        for url in ("/api/v1/version/all", "/api/v1/version/frontend",
+                    "/api/v1/version/backend", "/api/v1/version/full", "/api/v1/version/all"):
+            assert client.get(url).status_code == 200
+
+        assert len(manager_loads) == 1
+
+    def test_snapshot_invalidated_when_file_changes(self, version_file, manager_loads, client):
+        assert client.get("/api/v1/version/all").json()["backend"]["version"] == "1.2.3"
+
+        _write_version(version_file, "1.2.40", migration="def456")
+
+        data = client.get("/api/v1/version/all").json()
+        assert data["backend"]["version"] == "1.2.40"
+        assert data["database"]["migration"] == "def456"
+        assert len(manager_loads) == 2
+
+    @pytest.mark.asyncio
+    async def test_warm_version_cache_only_reloads_when_stale(self, version_file, manager_loads):
+        checker = server_module.update_checker
+
+        await checker.warm_version_cache()
+        await checker.warm_version_cache()
+        assert len(manager_loads) == 1
+
+        _write_version(version_file, "2.0.0")
+        await checker.warm_version_cache()
+        assert len(manager_loads) == 2
+        assert checker._snapshot.summary["backend_version"] == "2.0.0"
+
+
+@pytest.mark.unit
+class TestLogsDirectory:
+    """测试日志目录在模块导入前创建"""
+
+    def test_import_without_logs_dir(self, tmp_path):
+        """工作目录下没有 logs/ 时导入服务器模块，版本管理器仍可用"""
+        project_root = Path(server_module.__file__).resolve().parent.parent
+        env = dict(os.environ, PYTHONPATH=str(project_root))
+        result = subprocess.run(
+            [sys.executable, "-c",
+             "import update_server.server as s; print(s.VERSION_MANAGER_AVAILABLE)"],
+            cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120,
+        )
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1] == "True"
+        assert (tmp_path / "logs").is_dir()
@@ -0,0 +1,566 @@
+# -*- coding: utf-8 -*-
+"""updater/updater.py 独立更新器单元测试"""
+import errno
+import hashlib
+import http.server
+import itertools
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import updater.updater as updater_module
+from updater.updater import FastBlogUpdater
+
+
+def _write_tree(root, files):
+    """按 {相对路径: 内容} 创建文件"""
+    for rel, content in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+
+
+def _read_tree(root):
+    """读取目录树为 {相对路径: 内容}"""
+    return {
+        str(path.relative_to(root)): path.read_text(encoding="utf-8")
+        for path in sorted(root.rglob("*"))
+        if path.is_file()
+    }
+
+
+@pytest.fixture
+def make_updater(tmp_path):
+    """创建指向临时应用目录的更新器，备份目录也放在临时目录中"""
+    created = []
+
+    def factory(app_path=None):
+        app_path = app_path or tmp_path / "app"
+        app_path.mkdir(parents=True, exist_ok=True)
+        upd = FastBlogUpdater("9.9.9", str(app_path))
+        upd.base_dir = tmp_path
+        upd.backup_dir = tmp_path / "backups"
+        upd.backup_dir.mkdir(exist_ok=True)
+        created.append(upd)
+        return upd
+
+    yield factory
+
+    for upd in created:
+        upd.cleanup()
+
+
+@pytest.mark.unit
+class TestTempDir:
+    """测试临时目录的位置"""
+
+    def test_cross_device_temp_dir_is_sibling_of_app(self, tmp_path, monkeypatch):
+        """/tmp 在其他文件系统时，临时目录放在应用目录旁边而不是内部"""
+        monkeypatch.setattr(updater_module, "_same_device", lambda a, b: False)
+        app_path = tmp_path / "app"
+        upd = FastBlogUpdater.__new__(FastBlogUpdater)
+        upd.app_path = app_path.resolve()
+        app_path.mkdir()
+
+        temp_dir = upd._make_temp_dir()
+        try:
+            assert temp_dir.parent == app_path.parent.resolve()
+            assert not temp_dir.is_relative_to(upd.app_path)
+        finally:
+            temp_dir.rmdir()
+
+    def test_swap_succeeds_when_temp_dir_is_sibling(self, tmp_path, monkeypatch, make_updater):
+        """应用目录即项目根目录时，替换不能因为把目录移入自身而失败（EINVAL）"""
+        monkeypatch.setattr(updater_module, "_same_device", lambda a, b: False)
+        upd = make_updater()
+        _write_tree(upd.app_path, {"main.py": "old", "src/a.py": "old-a"})
+
+        staged = upd.temp_dir / "temp_app"
+        _write_tree(staged, {"main.py": "new", "src/b.py": "new-b"})
+
+        assert upd.apply_update(staged) is True
+        assert _read_tree(upd.app_path) == {"main.py": "new", "src/b.py": "new-b"}
+        assert not (upd.temp_dir / "old_app").exists()
+
+
+def _make_package(path, members):
+    """创建 ZIP 更新包，members 为 {成员名: bytes}"""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return path
+
+
+@pytest.mark.unit
+class TestPackageVerifyAndExtract:
+    """测试更新包的并行校验与解压"""
+
+    @pytest.fixture
+    def members(self):
+        # 成员数量远多于线程数，让各线程频繁交替打开 / 关闭成员
+        return {f"pkg/dir{i % 7}/file{i}.bin": os.urandom(2048 + i) for i in range(300)}
+
+    def test_verify_and_extract_many_members(self, tmp_path, make_updater, members):
+        upd = make_updater()
+        package = _make_package(tmp_path / "update.zip", members)
+
+        for _ in range(3):
+            assert upd.verify_package_integrity(package) is True
+
+        extracted = upd.extract_update_package(package)
+        assert extracted is not None
+        for name, data in members.items():
+            assert (extracted / name).read_bytes() == data
+
+    def test_worker_zipfiles_are_not_shared(self, tmp_path, monkeypatch, make_updater, members):
+        """每个工作线程使用独立的 ZipFile，线程池结束后全部关闭"""
+        opened = []
+        real_zipfile = updater_module.ZipFile
+
+        def tracking_zipfile(*args, **kwargs):
+            zf = real_zipfile(*args, **kwargs)
+            opened.append(zf)
+            return zf
+
+        monkeypatch.setattr(updater_module, "ZipFile", tracking_zipfile)
+        upd = make_updater()
+        package = _make_package(tmp_path / "update.zip", members)
+
+        assert upd.extract_update_package(package) is not None
+        # 第一个是主线程缓存的句柄，其余为工作线程句柄，且都已关闭
+        assert len(opened) >= 2
+        assert all(zf.fp is None for zf in opened[1:])
+
+    def test_verify_detects_corrupt_member(self, tmp_path, make_updater):
+        upd = make_updater()
+        package = _make_package(tmp_path / "update.zip", {"a.bin": os.urandom(64 * 1024)})
+        data = bytearray(package.read_bytes())
+        data[1024] ^= 0xFF
+        package.write_bytes(bytes(data))
+
+        assert upd.verify_package_integrity(package) is False
+
+    def test_extract_strips_unsafe_paths(self, tmp_path, make_updater):
+        upd = make_updater()
+        package = _make_package(tmp_path / "update.zip", {
+            "../evil.txt": b"x" * 2048,
+            "/abs/file.txt": b"y" * 2048,
+        })
+
+        extracted = upd.extract_update_package(package)
+        assert (extracted / "evil.txt").exists()
+        assert (extracted / "abs" / "file.txt").exists()
+        assert not (extracted.parent / "evil.txt").exists()
+
+
+@pytest.mark.unit
+class TestBackup:
+    """测试更新前备份"""
+
+    def test_in_place_writes_do_not_change_backup(self, make_updater):
+        """数据文件不与应用共享 inode，原地写入不会改动备份"""
+        upd = make_updater()
+        _write_tree(upd.app_path, {"main.py": "code", "data/blog.db": "v1", "logs/app.log": "line1\n"})
+
+        backup = upd.backup_current_version()
+        assert backup == upd._list_backups()[0]
+
+        with open(upd.app_path / "data" / "blog.db", "r+", encoding="utf-8") as f:
+            f.write("v2")
+        with open(upd.app_path / "logs" / "app.log", "a", encoding="utf-8") as f:
+            f.write("line2\n")
+
+        assert (backup / "data" / "blog.db").read_text(encoding="utf-8") == "v1"
+        assert (backup / "logs" / "app.log").read_text(encoding="utf-8") == "line1\n"
+        assert (backup / "main.py").read_text(encoding="utf-8") == "code"
+
+    def test_backup_dir_inside_app_is_excluded_and_survives_swap(self, make_updater):
+        """备份目录位于应用目录内（默认布局）时，快照不递归进入自身，替换后备份仍保留"""
+        upd = make_updater()
+        upd.backup_dir = upd.app_path / "backups" / "update_backups"
+        upd.backup_dir.mkdir(parents=True)
+        _write_tree(upd.app_path, {"main.py": "old"})
+
+        backup = upd.backup_current_version()
+        assert backup == upd._list_backups()[0]
+        assert not (backup / "backups" / "update_backups").exists()
+
+        staged = upd.temp_dir / "temp_app"
+        _write_tree(staged, {"main.py": "new"})
+        assert upd.apply_update(staged) is True
+
+        assert (upd.app_path / "main.py").read_text(encoding="utf-8") == "new"
+        assert [path.name for path in upd._list_backups()] == [backup.name]
+
+    def test_backup_taken_after_app_stopped(self, make_updater, tmp_path, monkeypatch):
+        """update() 在停止主程序之后才备份"""
+        upd = make_updater()
+        package = _make_package(tmp_path / "update.zip", {"main.py": os.urandom(4096)})
+        calls = []
+
+        monkeypatch.setattr(upd, "download_update_package", lambda: package)
+        monkeypatch.setattr(upd, "stop_main_application", lambda: calls.append("stop") or True)
+        monkeypatch.setattr(upd, "backup_current_version", lambda: calls.append("backup") or upd.backup_dir)
+        monkeypatch.setattr(upd, "apply_update", lambda staged: calls.append("apply") or True)
+        monkeypatch.setattr(updater_module, "add_update_history", None)
+
+        assert upd.update() is True
+        assert calls == ["stop", "backup", "apply"]
+
+    def test_update_history_records_created_backup(self, make_updater, tmp_path, monkeypatch):
+        """更新历史记录 backup_current_version 实际创建的目录，而不是重新按当前时间拼接的路径"""
+        upd = make_updater()
+        _write_tree(upd.app_path, {"main.py": "old"})
+        package = _make_package(tmp_path / "update.zip", {"main.py": os.urandom(4096)})
+        history = []
+
+        monkeypatch.setattr(upd, "download_update_package", lambda: package)
+        monkeypatch.setattr(upd, "stop_main_application", lambda: True)
+        monkeypatch.setattr(upd, "apply_update", lambda staged: True)
+        monkeypatch.setattr(updater_module, "add_update_history", lambda **kwargs: history.append(kwargs))
+        # 每次读取时间都前进一秒，按当前时间重新拼接的路径会指向不存在的目录
+        clock = itertools.count(1000)
+        monkeypatch.setattr(updater_module.time, "time", lambda: float(next(clock)))
+
+        assert upd.update() is True
+        assert len(history) == 1
+        recorded = Path(history[0]["backup_path"])
+        assert recorded.is_dir()
+        assert recorded == upd._list_backups()[0]
+
+    def test_backup_failure_returns_none(self, make_updater, monkeypatch):
+        upd = make_updater()
+        _write_tree(upd.app_path, {"main.py": "old"})
+
+        def broken_link_tree(*args, **kwargs):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(updater_module, "_link_tree", broken_link_tree)
+        assert upd.backup_current_version() is None
+
+
+def _exdev_for(monkeypatch, source):
+    """让从 source 出发的 os.replace 抛出 EXDEV，模拟跨文件系统重命名"""
+    real_replace = os.replace
+
+    def fake_replace(src, dst, *args, **kwargs):
+        if Path(src) == Path(source):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return real_replace(src, dst, *args, **kwargs)
+
+    monkeypatch.setattr(updater_module.os, "replace", fake_replace)
+
+
+@pytest.mark.unit
+class TestApplyUpdate:
+    """测试新旧版本目录的替换"""
+
+    def test_failed_swap_restores_old_app(self, make_updater):
+        """新版本无法就位时旧版本被移回原处"""
+        upd = make_updater()
+        _write_tree(upd.app_path, {"main.py": "old"})
+
+        assert upd.apply_update(upd.temp_dir / "missing") is False
+        assert _read_tree(upd.app_path) == {"main.py": "old"}
+        assert not (upd.temp_dir / "old_app").exists()
+
+    def test_cross_device_swap_falls_back_to_move(self, make_updater, monkeypatch):
+        upd = make_updater()
+        _write_tree(upd.app_path, {"main.py": "old"})
+        staged = upd.temp_dir / "temp_app"
+        _write_tree(staged, {"main.py": "new"})
+        _exdev_for(monkeypatch, staged)
+
+        assert upd.apply_update(staged) is True
+        assert _read_tree(upd.app_path) == {"main.py": "new"}
+        assert not staged.exists()
+
+
+@pytest.mark.unit
+class TestRollback:
+    """测试回滚到最新备份"""
+
+    def test_copy_rollback_keeps_backup_dir_inside_app(self, make_updater):
+        """备份目录位于应用目录内时，回滚清空应用目录不会连带删除正在使用的备份"""
+        upd = make_updater()
+        upd.backup_dir = upd.app_path / "backups" / "update_backups"
+        upd.backup_dir.mkdir(parents=True)
+        _write_tree(upd.app_path, {"main.py": "old", "pkg/mod.py": "old", "backups/keep.txt": "x"})
+        backup = upd.backup_current_version()
+
+        # 更新整体替换代码文件，不原地改写（与备份共享 inode 的文件保持不变）
+        (upd.app_path / "main.py").unlink()
+        _write_tree(upd.app_path, {"main.py": "broken", "extra.py": "new only"})
+
+        assert upd.rollback() is True
+        assert (upd.app_path / "main.py").read_text(encoding="utf-8") == "old"
+        assert (upd.app_path / "pkg" / "mod.py").read_text(encoding="utf-8") == "old"
+        assert not (upd.app_path / "extra.py").exists()
+        assert not (upd.app_path / "backup_info.json").exists()
+        assert upd._list_backups() == [backup]
+
+    def test_no_backup_returns_false(self, make_updater):
+        upd = make_updater()
+        _write_tree(upd.app_path, {"main.py": "current"})
+
+        assert upd.rollback() is False
+        assert _read_tree(upd.app_path) == {"main.py": "current"}
+
+    def test_rename_rollback_consumes_backup(self, make_updater):
+        """备份在应用目录外时，通过 rename 把最新备份换成应用目录"""
+        upd = make_updater()
+        _write_tree(upd.backup_dir / "backup_100", {"main.py": "v100", "backup_info.json": "{}"})
+        _write_tree(upd.backup_dir / "backup_200", {"main.py": "v200", "backup_info.json": "{}"})
+        _write_tree(upd.app_path, {"main.py": "broken"})
+
+        assert upd.rollback() is True
+        assert _read_tree(upd.app_path) == {"main.py": "v200"}
+        assert [path.name for path in upd._list_backups()] == ["backup_100"]
+
+        # 被换下的目录在后台线程中删除
+        deadline = time.monotonic() + 5
+        while list(upd.app_path.parent.glob("app.broken.*")) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert list(upd.app_path.parent.glob("app.broken.*")) == []
+
+    def test_newest_valid_backup_is_used(self, make_updater):
+        """按目录名时间戳从新到旧选择，缺少或无法解析 backup_info.json 的备份被跳过"""
+        upd = make_updater()
+        _write_tree(upd.backup_dir / "backup_100", {"main.py": "v100", "backup_info.json": "{}"})
+        _write_tree(upd.backup_dir / "backup_300", {"main.py": "v300"})
+        _write_tree(upd.backup_dir / "backup_400", {"main.py": "v400", "backup_info.json": "{broken"})
+        _write_tree(upd.backup_dir / "not_a_backup", {"main.py": "x", "backup_info.json": "{}"})
+        _write_tree(upd.app_path, {"main.py": "broken"})
+
+        assert upd.rollback() is True
+        assert _read_tree(upd.app_path) == {"main.py": "v100"}
+        assert [path.name for path in upd._list_backups()] == ["backup_400", "backup_300"]
+
+    def test_cross_device_backup_falls_back_to_copy(self, make_updater, monkeypatch):
+        """备份与应用目录不在同一文件系统时 rename 失败，恢复原目录后改为复制，备份保留"""
+        upd = make_updater()
+        backup = upd.backup_dir / "backup_100"
+        _write_tree(backup, {"main.py": "v100", "pkg/mod.py": "m", "backup_info.json": "{}"})
+        _write_tree(upd.app_path, {"main.py": "broken", "extra.py": "x"})
+        _exdev_for(monkeypatch, backup)
+
+        assert upd._swap_in_backup(backup) is False
+        assert _read_tree(upd.app_path) == {"main.py": "broken", "extra.py": "x"}
+
+        assert upd.rollback() is True
+        assert _read_tree(upd.app_path) == {"main.py": "v100", "pkg/mod.py": "m"}
+        assert upd._list_backups() == [backup]
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="依赖 POSIX 信号和 /proc")
+class TestStopByPidFile:
+    """测试根据 PID 文件停止主程序"""
+
+    @pytest.fixture
+    def spawn(self, tmp_path):
+        """启动一个长时间运行的子进程，后台线程负责回收，避免残留僵尸进程"""
+        procs = []
+
+        def factory(script_name):
+            script = tmp_path / script_name
+            script.write_text("import time\ntime.sleep(60)\n", encoding="utf-8")
+            proc = subprocess.Popen([sys.executable, str(script)])
+            threading.Thread(target=proc.wait, daemon=True).start()
+            procs.append(proc)
+            time.sleep(0.2)
+            return proc
+
+        yield factory
+
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+
+    def _write_pid_file(self, upd, pid):
+        pid_file = upd.app_path / updater_module.MAIN_PID_FILE
+        pid_file.parent.mkdir(parents=True, exist_ok=True)
+        pid_file.write_text(str(pid))
+        return pid_file
+
+    def test_stops_main_process(self, make_updater, spawn):
+        upd = make_updater()
+        proc = spawn("main.py")
+        pid_file = self._write_pid_file(upd, proc.pid)
+
+        assert upd._stop_by_pid_file(pid_file) is True
+        proc.wait(timeout=5)
+        assert not pid_file.exists()
+
+    def test_unrelated_process_is_not_signalled(self, make_updater, spawn):
+        """PID 被非主程序进程复用时不发送信号，删除残留的 PID 文件"""
+        upd = make_updater()
+        proc = spawn("other_service.py")
+        pid_file = self._write_pid_file(upd, proc.pid)
+
+        assert upd._stop_by_pid_file(pid_file) is False
+        assert proc.poll() is None
+        assert not pid_file.exists()
+
+    def test_pid_file_older_than_process_is_stale(self, make_updater, spawn):
+        """PID 文件写于进程启动之前（例如重启前残留），视为失效"""
+        upd = make_updater()
+        proc = spawn("main.py")
+        pid_file = self._write_pid_file(upd, proc.pid)
+        old = time.time() - 3600
+        os.utime(pid_file, (old, old))
+
+        assert upd._stop_by_pid_file(pid_file) is False
+        assert proc.poll() is None
+        assert not pid_file.exists()
+
+    def test_dead_pid_falls_through(self, make_updater):
+        upd = make_updater()
+        proc = subprocess.Popen([sys.executable, "-c", "pass"])
+        proc.wait()
+        pid_file = self._write_pid_file(upd, proc.pid)
+
+        assert upd._stop_by_pid_file(pid_file) is False
+        assert not pid_file.exists()
+
+
+class _PackageHandler(http.server.BaseHTTPRequestHandler):
+    """按 server 上的配置返回更新包，可选支持 HEAD / Range / 校验和响应头"""
+
+    def log_message(self, *args):
+        pass
+
+    def _common_headers(self, length):
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", '"pkg-v1"')
+        if self.server.accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if self.server.checksum:
+            self.send_header("X-Checksum-SHA256", self.server.checksum)
+
+    def do_HEAD(self):
+        self.server.requests.append(("HEAD", None))
+        if not self.server.allow_head:
+            self.send_response(405)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self._common_headers(len(self.server.payload))
+        self.end_headers()
+
+    def do_GET(self):
+        payload = self.server.payload
+        range_header = self.headers.get("Range")
+        self.server.requests.append(("GET", range_header))
+        match = re.match(r"bytes=(\d+)-(\d*)", range_header or "")
+        if match and self.server.accept_ranges:
+            lo = int(match.group(1))
+            hi = int(match.group(2)) if match.group(2) else len(payload) - 1
+            body = payload[lo:hi + 1]
+            self.send_response(206)
+        else:
+            body = payload
+            self.send_response(200)
+        self._common_headers(len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def package_server(monkeypatch):
+    """本地更新服务器，UPDATE_SERVER_URL 指向它"""
+    pytest.importorskip("requests")
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _PackageHandler)
+    server.payload = os.urandom(256 * 1024 + 123)
+    server.allow_head = True
+    server.accept_ranges = True
+    server.checksum = None
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setenv("UPDATE_SERVER_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(updater_module, "DOWNLOAD_MIN_RANGE_SIZE", 1024)
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.unit
+class TestDownload:
+    """测试更新包下载"""
+
+    def _package_file(self, upd):
+        return upd.base_dir / "releases" / f"update_{upd.target_version}.zip"
+
+    def test_ranged_download(self, make_updater, package_server):
+        upd = make_updater()
+
+        package = upd.download_update_package()
+        assert package.read_bytes() == package_server.payload
+        ranged = [r for method, r in package_server.requests if method == "GET"]
+        assert len(ranged) == updater_module.DOWNLOAD_PARTS
+        assert all(r and r.startswith("bytes=") for r in ranged)
+        assert not package.with_name(package.name + ".part").exists()
+        assert not package.with_name(package.name + ".state").exists()
+
+    def test_stale_larger_part_file_is_truncated(self, make_updater, package_server):
+        """旧的、更大的 .part 文件不能让新包多出尾部字节"""
+        upd = make_updater()
+        package_server.checksum = hashlib.sha256(package_server.payload).hexdigest()
+        part = self._package_file(upd).with_name(f"update_{upd.target_version}.zip.part")
+        part.parent.mkdir(parents=True, exist_ok=True)
+        part.write_bytes(os.urandom(len(package_server.payload) * 2))
+
+        package = upd.download_update_package()
+        assert package is not None
+        assert package.read_bytes() == package_server.payload
+        assert upd._verified is True
+
+    def test_head_not_allowed_falls_back_to_single_get(self, make_updater, package_server):
+        upd = make_updater()
+        package_server.allow_head = False
+
+        package = upd.download_update_package()
+        assert package.read_bytes() == package_server.payload
+        assert [m for m, _ in package_server.requests] == ["HEAD", "GET"]
+
+    def test_no_accept_ranges_falls_back_to_single_get(self, make_updater, package_server):
+        upd = make_updater()
+        package_server.accept_ranges = False
+
+        package = upd.download_update_package()
+        assert package.read_bytes() == package_server.payload
+        assert [m for m, _ in package_server.requests] == ["HEAD", "GET"]
+
+    def test_resume_single_connection_download(self, make_updater, package_server):
+        """单连接下载从 .part 文件续传，只请求剩余部分"""
+        upd = make_updater()
+        package_server.allow_head = False
+        package_server.checksum = hashlib.sha256(package_server.payload).hexdigest()
+        package_file = self._package_file(upd)
+        package_file.parent.mkdir(parents=True, exist_ok=True)
+        half = len(package_server.payload) // 2
+        package_file.with_name(package_file.name + ".part").write_bytes(package_server.payload[:half])
+        package_file.with_name(package_file.name + ".etag").write_text('"pkg-v1"')
+
+        package = upd.download_update_package()
+        assert package.read_bytes() == package_server.payload
+        assert ("GET", f"bytes={half}-") in package_server.requests
+        assert upd._verified is True
+
+    def test_checksum_mismatch_rejects_package(self, make_updater, package_server):
+        upd = make_updater()
+        package_server.checksum = "0" * 64
+
+        assert upd.download_update_package() is None
+        assert not self._package_file(upd).exists()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""shared/utils/version_manager.py 版本管理器单元测试"""
+import json
+import types
+
+import pytest
+
+import shared.utils
+import shared.utils.version_manager as vm_module
+from shared.utils.version_manager import VersionManager, get_version_manager
+
+
+@pytest.fixture(autouse=True)
+def clear_parse_cache():
+    vm_module._PARSE_CACHE.clear()
+    yield
+    vm_module._PARSE_CACHE.clear()
+
+
+@pytest.fixture
+def version_file(tmp_path):
+    path = tmp_path / "version.txt"
+    path.write_text(json.dumps({
+        "release": {"version": "1.2.3", "build_time": "2026-01-01T00:00:00"},
+        "database": {"migration": "abc123", "status": "up_to_date"},
+    }), encoding="utf-8")
+    return path
+
+
+@pytest.mark.unit
+class TestGlobalAccessor:
+    """测试全局实例的访问方式"""
+
+    def test_package_attribute_is_the_submodule(self):
+        """shared.utils.version_manager 是子模块，全局实例通过 get_version_manager() 获取"""
+        assert isinstance(shared.utils.version_manager, types.ModuleType)
+        assert "version_manager" not in shared.utils.__all__
+        assert "get_version_manager" in shared.utils.__all__
+
+    def test_get_version_manager_is_lazy_singleton(self, monkeypatch):
+        monkeypatch.setattr(vm_module, "_version_manager", None)
+        created = []
+        monkeypatch.setattr(vm_module, "VersionManager", lambda: created.append(1) or object())
+
+        first = get_version_manager()
+        assert get_version_manager() is first
+        assert created == [1]
+
+    def test_module_attribute_compat(self, monkeypatch):
+        """from shared.utils.version_manager import version_manager 仍返回全局实例"""
+        sentinel = object()
+        monkeypatch.setattr(vm_module, "_version_manager", sentinel)
+        from shared.utils.version_manager import version_manager
+        assert version_manager is sentinel
+
+
+@pytest.mark.unit
+class TestLoadAndSave:
+    """测试版本文件的解析缓存与写入"""
+
+    def test_reads_json(self, version_file):
+        manager = VersionManager(str(version_file))
+        assert manager.get_version() == "1.2.3"
+        assert manager.get_database_info()["migration"] == "abc123"
+
+    def test_parse_cache_returns_independent_copies(self, version_file):
+        first = VersionManager(str(version_file))
+        first._data["release"]["version"] = "mutated"
+
+        second = VersionManager(str(version_file))
+        assert second.get_version() == "1.2.3"
+
+    def test_cache_invalidated_when_file_changes(self, version_file):
+        assert VersionManager(str(version_file)).get_version() == "1.2.3"
+
+        data = json.loads(version_file.read_text(encoding="utf-8"))
+        data["release"]["version"] = "1.2.40"
+        version_file.write_text(json.dumps(data), encoding="utf-8")
+
+        assert VersionManager(str(version_file)).get_version() == "1.2.40"
+
+    def test_legacy_ini_with_percent_sign(self, tmp_path):
+        path = tmp_path / "version.txt"
+        path.write_text("[RELEASE]\nversion = 0.9.0\nnote = 100% done\n", encoding="utf-8")
+
+        manager = VersionManager(str(path))
+        assert manager.get_version() == "0.9.0"
+        assert manager.get_release_info()["note"] == "100% done"
+
+    def test_save_skips_unchanged_content(self, version_file):
+        manager = VersionManager(str(version_file))
+        manager._save()
+        mtime = version_file.stat().st_mtime_ns
+
+        manager._save()
+        assert version_file.stat().st_mtime_ns == mtime
+        assert not version_file.with_name("version.txt.tmp").exists()
+
+    def test_bump_version_writes_atomically(self, version_file):
+        manager = VersionManager(str(version_file))
+        manager.bump_version("2.0.0")
+
+        assert json.loads(version_file.read_text(encoding="utf-8"))["release"]["version"] == "2.0.0"
+        assert VersionManager(str(version_file)).get_version() == "2.0.0"
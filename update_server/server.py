@@ -6,23 +6,30 @@
 """
 
 
+import asyncio
+import configparser
 import json
 import logging
+import logging.handlers
 import os
 import signal
 import sys
 import time
+from collections import namedtuple
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 # 添加项目根目录到 Python 路径
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
+# 统一日志在导入时即打开 logs/app.log，必须在导入版本管理器等模块之前创建日志目录
+os.makedirs('logs', exist_ok=True)
+
 # 导入版本管理器（简化版）
 try:
-    from shared.utils.version_manager import version_manager
+    from shared.utils.version_manager import VersionManager
     VERSION_MANAGER_AVAILABLE = True
     logging.info("版本管理器加载成功")
 except Exception as e:
@@ -38,19 +45,38 @@ except Exception as e:
     logging.warning(f"自动更新检查器导入失败：{e}")
     AUTO_CHECKER_AVAILABLE = False
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
-
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+
+# orjson 可用时使用更快的 ORJSONResponse 序列化响应，否则回退到标准库 json
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as JSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse
 
 from src.unified_logger import default_logger as logger
 
+# 秒级缓存的 ISO 时间戳：[生成时间, 格式化结果]
+_ts_cache = [0.0, '']
+
+
+def _iso_now() -> str:
+    """返回当前时间的 ISO 字符串，同一秒内复用格式化结果（仅用于展示类字段）"""
+    now = time.time()
+    if now - _ts_cache[0] >= 1.0:
+        _ts_cache[0] = now
+        _ts_cache[1] = datetime.fromtimestamp(now).isoformat()
+    return _ts_cache[1]
+
+
+# 版本信息快照：version.txt 未变化时所有接口共用同一份解析结果
+VersionSnapshot = namedtuple('VersionSnapshot', 'frontend backend database summary mtime')
+
 app = FastAPI(
     title="FastBlog Update Checker",
     description="独立的更新检查服务",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=JSONResponse
 )
 
 
@@ -62,15 +88,91 @@ class UpdateChecker:
         self.version_file = self.base_dir / "version.txt"
         self.running = False
         self.start_time = time.time()
+        # 本地版本信息缓存：(st_mtime_ns, st_size, 解析结果)
+        self._local_version_cache: Optional[Tuple[int, int, Dict[str, Any]]] = None
+        self._snapshot: Optional[VersionSnapshot] = None
+
+    def get_minimal_status(self) -> Dict[str, str]:
+        """只获取更新状态所需的前后端版本号"""
+        if VERSION_MANAGER_AVAILABLE:
+            snapshot = self._get_snapshot()
+            return {
+                'current_version': snapshot.backend.get('version', 'unknown'),
+                'frontend_version': snapshot.frontend.get('version', 'unknown')
+            }
+
+        local_info = self.get_local_version_info()
+        return {
+            'current_version': local_info.get('backend_version', 'unknown'),
+            'frontend_version': local_info.get('frontend_version', 'unknown')
+        }
+
+    async def warm_version_cache(self):
+        """
+        确保版本信息缓存有效
+
+        缓存命中时只做一次 stat，不离开事件循环；version.txt 变化时在线程池中重新加载，
+        避免文件读取阻塞其他并发请求。
+        """
+        try:
+            st = self.version_file.stat()
+            mtime = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            mtime = None
+
+        if VERSION_MANAGER_AVAILABLE:
+            fresh = self._snapshot is not None and self._snapshot.mtime == mtime
+            loader = self._get_snapshot
+        else:
+            cached = self._local_version_cache
+            fresh = mtime is None or (cached is not None and cached[:2] == mtime)
+            loader = self.get_local_version_info
+
+        if not fresh:
+            await asyncio.to_thread(loader)
+
+    def _get_snapshot(self) -> VersionSnapshot:
+        """获取版本信息快照，仅在 version.txt 的修改时间或大小变化时重新加载"""
+        try:
+            st = self.version_file.stat()
+            mtime = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            mtime = None
+
+        snapshot = self._snapshot
+        if snapshot is not None and mtime is not None and snapshot.mtime == mtime:
+            return snapshot
+
+        manager = VersionManager(str(self.version_file))
+        frontend = manager.get_frontend_version()
+        backend = manager.get_backend_version()
+        database = manager.get_database_info()
+        if mtime is None:
+            # 版本文件由 VersionManager 新建，记录新文件的状态
+            st = self.version_file.stat()
+            mtime = (st.st_mtime_ns, st.st_size)
+
+        self._snapshot = VersionSnapshot(
+            frontend=frontend,
+            backend=backend,
+            database=database,
+            summary={
+                'backend_version': backend.get('version', '0.0.0'),
+                'frontend_version': frontend.get('version', '0.0.0'),
+                'database_migration': database.get('migration', '')
+            },
+            mtime=mtime
+        )
+        return self._snapshot
 
     def get_local_version_info(self) -> Dict[str, Any]:
         """获取本地版本信息（兼容旧版）"""
         try:
             # 优先使用版本管理器
             if VERSION_MANAGER_AVAILABLE:
-                all_versions = version_manager.get_all_versions()
-                backend_info = all_versions.get('BACKEND', {})
-                frontend_info = all_versions.get('FRONTEND', {})
+                snapshot = self._get_snapshot()
+                backend_info = snapshot.backend
+                frontend_info = snapshot.frontend
 
                 return {
                     "backend_version": backend_info.get('version', '0.0.0'),
@@ -82,30 +184,34 @@ class UpdateChecker:
 
             # 回退到读取文件方式
             if self.version_file.exists():
+                # 文件未修改时直接返回缓存，避免健康检查轮询反复读取解析
+                st = self.version_file.stat()
+                cached = self._local_version_cache
+                if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                    return dict(cached[2])
+
                 with open(self.version_file, 'r', encoding='utf-8') as f:
                     content = f.read()
 
-                # 解析 INI 格式
-                version_info = {}
-                current_section = None
-                for line in content.strip().split('\n'):
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    if line.startswith('[') and line.endswith(']'):
-                        current_section = line[1:-1]
-                        version_info[current_section] = {}
-                    elif '=' in line and current_section:
-                        key, value = line.split('=', 1)
-                        version_info[current_section][key.strip()] = value.strip()
-
-                return {
-                    "backend_version": version_info.get("BACKEND", {}).get("version", "0.0.0"),
-                    "frontend_version": version_info.get("FRONTEND", {}).get("version", "0.0.0"),
-                    "build_time": version_info.get("BACKEND", {}).get("build_time", ""),
-                    "framework": version_info.get("BACKEND", {}).get("framework", ""),
+                # 解析 INI 格式（无需插值，使用 RawConfigParser）
+                parser = configparser.RawConfigParser(delimiters=('=',), strict=False)
+                try:
+                    parser.read_string(content)
+                except configparser.Error as e:
+                    # 与旧的逐行解析保持一致：忽略无法识别的行，保留已解析的内容
+                    logger.warning(f"版本文件存在无法解析的内容：{e}")
+
+                backend = parser['BACKEND'] if parser.has_section('BACKEND') else {}
+                frontend = parser['FRONTEND'] if parser.has_section('FRONTEND') else {}
+                result = {
+                    "backend_version": backend.get("version", "0.0.0"),
+                    "frontend_version": frontend.get("version", "0.0.0"),
+                    "build_time": backend.get("build_time", ""),
+                    "framework": backend.get("framework", ""),
                     "status": "success"
                 }
+                self._local_version_cache = (st.st_mtime_ns, st.st_size, result)
+                return dict(result)
 
             return {
                 "backend_version": "0.0.0",
@@ -130,15 +236,16 @@ class UpdateChecker:
         """获取完整的版本信息"""
         try:
             if VERSION_MANAGER_AVAILABLE:
-                versions = version_manager.get_all_versions()
-                summary = get_version_summary()
+                snapshot = self._get_snapshot()
+                versions = {'BACKEND': snapshot.backend, 'FRONTEND': snapshot.frontend}
+                summary = snapshot.summary
 
                 return {
                     'success': True,
                     'data': {
                         'versions': versions,
                         'summary': summary,
-                        'timestamp': datetime.now().isoformat()
+                        'timestamp': _iso_now()
                     }
                 }
             else:
@@ -149,7 +256,7 @@ class UpdateChecker:
                     'data': {
                         'backend_version': local_info.get('backend_version', 'unknown'),
                         'frontend_version': local_info.get('frontend_version', 'unknown'),
-                        'timestamp': datetime.now().isoformat()
+                        'timestamp': _iso_now()
                     }
                 }
         except Exception as e:
@@ -164,7 +271,7 @@ class UpdateChecker:
         """获取前端版本信息"""
         try:
             if VERSION_MANAGER_AVAILABLE:
-                frontend_info = version_manager.get_frontend_version()
+                frontend_info = self._get_snapshot().frontend
                 return {
                     'success': True,
                     'data': frontend_info
@@ -189,7 +296,7 @@ class UpdateChecker:
         """获取后端版本信息"""
         try:
             if VERSION_MANAGER_AVAILABLE:
-                backend_info = version_manager.get_backend_version()
+                backend_info = self._get_snapshot().backend
                 return {
                     'success': True,
                     'data': backend_info
@@ -210,6 +317,36 @@ class UpdateChecker:
                 'data': None
             }
 
+    def get_all_version_info(self) -> Dict[str, Any]:
+        """一次性获取前端、后端和数据库版本信息，供版本面板合并请求使用"""
+        try:
+            if VERSION_MANAGER_AVAILABLE:
+                snapshot = self._get_snapshot()
+                data = {
+                    'frontend': snapshot.frontend,
+                    'backend': snapshot.backend,
+                    'database': snapshot.database
+                }
+            else:
+                local_info = self.get_local_version_info()
+                data = {
+                    'frontend': {'version': local_info.get('frontend_version', 'unknown')},
+                    'backend': {'version': local_info.get('backend_version', 'unknown')},
+                    'database': {}
+                }
+            data['timestamp'] = _iso_now()
+            return {
+                'success': True,
+                'data': data
+            }
+        except Exception as e:
+            logger.error(f"获取全部版本信息失败：{e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'data': None
+            }
+
 
 # 创建更新检查器实例
 update_checker = UpdateChecker()
@@ -229,6 +366,7 @@ async def root():
 async def get_version_info():
     """获取版本信息接口"""
     try:
+        await update_checker.warm_version_cache()
         version_info = update_checker.get_local_version_info()
         return JSONResponse(content=version_info)
     except Exception as e:
@@ -265,6 +403,7 @@ async def get_config_info():
 @app.get("/api/v1/version/full")
 async def get_full_version_info():
     """获取完整的版本信息"""
+    await update_checker.warm_version_cache()
     result = update_checker.get_version_info()
     if result['success']:
         return JSONResponse(content=result['data'])
@@ -275,6 +414,7 @@ async def get_full_version_info():
 @app.get("/api/v1/version/frontend")
 async def get_frontend_version_api():
     """获取前端版本信息"""
+    await update_checker.warm_version_cache()
     result = update_checker.get_frontend_version_info()
     if result['success']:
         return JSONResponse(content=result['data'])
@@ -285,6 +425,7 @@ async def get_frontend_version_api():
 @app.get("/api/v1/version/backend")
 async def get_backend_version_api():
     """获取后端版本信息"""
+    await update_checker.warm_version_cache()
     result = update_checker.get_backend_version_info()
     if result['success']:
         return JSONResponse(content=result['data'])
@@ -292,6 +433,17 @@ async def get_backend_version_api():
         raise HTTPException(status_code=500, detail=result['error'])
 
 
+@app.get("/api/v1/version/all")
+async def get_all_version_api():
+    """一次返回前端、后端和数据库版本信息，替代分别请求 frontend/backend/full"""
+    await update_checker.warm_version_cache()
+    result = update_checker.get_all_version_info()
+    if result['success']:
+        return JSONResponse(content=result['data'])
+    else:
+        raise HTTPException(status_code=500, detail=result['error'])
+
+
 # ==================== 基础更新状态API ====================
 
 @app.get("/api/v1/update/status")
@@ -299,20 +451,16 @@ async def get_update_status():
     """获取基础更新状态信息"""
     try:
         # 获取当前版本信息
-        version_info = update_checker.get_version_info()
-        if not version_info['success']:
-            raise HTTPException(status_code=500, detail=version_info['error'])
-
-        return JSONResponse(content={
+        await update_checker.warm_version_cache()
+        return {
             'success': True,
             'data': {
-                'current_version': version_info['data'].get('versions', {}).get('backend', {}).get('version', 'unknown'),
-                'frontend_version': version_info['data'].get('versions', {}).get('frontend', {}).get('version', 'unknown'),
+                **update_checker.get_minimal_status(),
                 'is_updating': False,  # 基础状态，实际更新状态由独立更新器管理
-                'last_check': datetime.now().isoformat(),
+                'last_check': _iso_now(),
                 'update_server': 'running'
             }
-        })
+        }
     except Exception as e:
         logger.error(f"获取更新状态失败：{e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -323,6 +471,7 @@ async def check_for_updates():
     """检查是否有新版本"""
     try:
         # 获取当前版本
+        await update_checker.warm_version_cache()
         current_info = update_checker.get_version_info()
         current_version = current_info['data'].get('versions', {}).get('backend', {}).get('version', '0.0.0')
 
@@ -383,8 +532,6 @@ async def apply_update(version: str = None):
     try:
         # 实现更新应用逻辑
         import subprocess
-        import sys
-        from pathlib import Path
 
         # 如果没有指定版本，使用最新版本
         if not version:
@@ -627,9 +774,6 @@ async def create_backup(version: str = None):
     """创建当前系统备份"""
     try:
         from shared.utils.backup_manager import backup_manager
-        from pathlib import Path
-
-        project_root = Path(__file__).resolve().parent.parent
 
         backup_info = backup_manager.create(str(project_root), version)
 
@@ -659,9 +803,6 @@ async def restore_backup(backup_id: str):
     """
     try:
         from shared.utils.backup_manager import backup_manager
-        from pathlib import Path
-
-        project_root = Path(__file__).resolve().parent.parent
 
         success = backup_manager.restore(backup_id, str(project_root))
 
@@ -726,12 +867,15 @@ def main():
     """服务器入口函数"""
     import uvicorn
 
-    # 配置日志
+    # 配置日志（日志文件按大小轮转，首次写入时才打开；日志目录已在模块顶部创建）
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
-            logging.FileHandler('logs/update_checker.log', encoding='utf-8'),
+            logging.handlers.RotatingFileHandler(
+                'logs/update_checker.log', maxBytes=10 * 1024 * 1024, backupCount=3,
+                encoding='utf-8', delay=True
+            ),
             logging.StreamHandler(sys.stdout)
         ]
     )
@@ -9,23 +9,35 @@ FastBlog 独立更新器
 """
 
 import argparse
+import atexit
+import errno
+import hashlib
 import json
+import logging
+import logging.handlers
 import os
 import shutil
+import signal
 import sys
 import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
-from zipfile import ZipFile
+from zipfile import ZipFile, ZipInfo
 
 # 添加项目根目录到 Python 路径
 base_dir = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(base_dir))
 
+# 统一日志在导入时即打开 logs/app.log（RotatingFileHandler 未设置 delay），
+# 必须在导入任何会用到它的模块之前创建日志目录
+(base_dir / 'logs').mkdir(exist_ok=True)
+
 # 导入版本管理器
 try:
-    from shared.utils.version_manager import version_manager
+    from shared.utils.version_manager import get_version_manager
 except Exception as e:
     print(f"警告：无法导入版本管理器：{e}")
 
@@ -36,8 +48,355 @@ except Exception as e:
     print(f"警告：无法导入更新历史管理器：{e}")
     add_update_history = None
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 from src.unified_logger import default_logger as logger
 
+# 分段并行下载的并发数；小于 DOWNLOAD_MIN_RANGE_SIZE 的文件直接单连接下载
+DOWNLOAD_PARTS = 8
+DOWNLOAD_MIN_RANGE_SIZE = 4 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# 更新服务器提供的包校验和响应头；校验通过后跳过 ZIP 的 CRC 检查
+CHECKSUM_HEADER = 'X-Checksum-SHA256'
+
+# 主应用进程写入的 PID 文件（相对应用目录），以及等待其退出的超时时间（秒）
+MAIN_PID_FILE = Path("run") / "main.pid"
+STOP_TIMEOUT = 10.0
+STOP_KILL_TIMEOUT = 2.0
+
+# 并行复制文件的线程数（I/O 密集型任务，线程数可以高于 CPU 核数）
+COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# 更新前备份最多保留的份数
+BACKUP_KEEP = 3
+
+# Linux FICLONE ioctl：在 btrfs / XFS 等文件系统上创建写时复制（CoW）副本
+FICLONE = 0x40049409
+
+# 文件系统不支持 reflink / 硬链接 / copy_file_range 时的 errno，遇到后回退到普通方式
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM, errno.ENOSYS}
+
+
+def _fast_copyfile(src: str, dst: str):
+    """
+    在内核态复制文件内容
+
+    Linux 上使用 os.copy_file_range，在 Btrfs / XFS / NFSv4.2 上还能触发 reflink 或服务端复制；
+    不支持时回退到 shutil.copyfile（Linux 上走 sendfile，macOS 上走 fcopyfile）。
+    """
+    if hasattr(os, 'copy_file_range'):
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            size = os.fstat(fsrc.fileno()).st_size
+            offset = 0
+            try:
+                while offset < size:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - offset, offset, offset)
+                    if copied == 0:
+                        break
+                    offset += copied
+                return
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_ERRNOS:
+                    raise
+    shutil.copyfile(src, dst)
+
+
+def _copy2(src: str, dst: str):
+    """shutil.copy2 的等价实现，文件内容通过 _fast_copyfile 复制"""
+    _fast_copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+
+_session = None
+
+
+def _get_session():
+    """
+    获取共享的 requests.Session（首次调用时创建）
+
+    分段下载的各个线程和重试都复用同一个连接池中的长连接，避免每个请求重新握手；
+    网关类错误自动按指数退避重试。未安装 requests 时抛出 ImportError。
+    """
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=max(16, DOWNLOAD_PARTS),
+            max_retries=Retry(total=5, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
+
+def _map_zip_members(package_file: Path, items: list, func, workers: int):
+    """
+    在线程池中逐个处理 ZIP 成员：func(zip_ref, item)
+
+    ZipFile 的引用计数和关闭逻辑不是线程安全的，多个线程同时 open/close 成员可能关闭
+    仍在读取的底层文件，因此每个工作线程打开自己的 ZipFile，线程池结束后统一关闭。
+    """
+    local = threading.local()
+    handles = []
+    lock = threading.Lock()
+
+    def task(item):
+        zip_ref = getattr(local, 'zip_ref', None)
+        if zip_ref is None:
+            zip_ref = local.zip_ref = ZipFile(package_file, 'r')
+            with lock:
+                handles.append(zip_ref)
+        func(zip_ref, item)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(task, items):
+                pass
+    finally:
+        for zip_ref in handles:
+            zip_ref.close()
+
+
+def _process_info(pid: int) -> Optional[tuple]:
+    """获取进程的 (启动时间戳, 命令行参数列表)，进程不存在或无法读取时返回 None"""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        try:
+            proc = psutil.Process(pid)
+            return proc.create_time(), proc.cmdline()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+
+    # 未安装 psutil 时直接读取 /proc（仅 Linux）
+    proc_dir = Path('/proc') / str(pid)
+    try:
+        cmdline = [arg.decode(errors='replace') for arg in (proc_dir / 'cmdline').read_bytes().split(b'\0') if arg]
+        # /proc/<pid>/stat 第 22 个字段为开机后的启动时刻（时钟节拍），进程名可能含空格，从最后一个 ')' 之后解析
+        fields = (proc_dir / 'stat').read_text().rsplit(')', 1)[1].split()
+        start_ticks = int(fields[19])
+        boot_time = next(
+            int(line.split()[1]) for line in Path('/proc/stat').read_text().splitlines()
+            if line.startswith('btime ')
+        )
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+    return boot_time + start_ticks / os.sysconf('SC_CLK_TCK'), cmdline
+
+
+def _is_main_process(pid: int, pid_file: Path) -> bool:
+    """
+    确认 PID 对应的仍是写入 PID 文件的主程序
+
+    进程必须在 PID 文件写入之前启动（启动时间不晚于文件 mtime），且命令行中包含 main.py；
+    崩溃或重启后残留的 PID 文件可能指向复用了该 PID 的无关进程，不能直接发信号。
+    """
+    info = _process_info(pid)
+    if info is None:
+        return False
+    create_time, cmdline = info
+    try:
+        written_at = pid_file.stat().st_mtime
+    except OSError:
+        return False
+    # 留 1 秒余量，抵消启动时间按时钟节拍取整带来的误差
+    if create_time > written_at + 1:
+        return False
+    return any(os.path.basename(arg) == 'main.py' for arg in cmdline)
+
+
+def _same_device(a: Path, b: Path) -> bool:
+    """判断两个路径是否位于同一文件系统（无法判断时按同一文件系统处理）"""
+    try:
+        return os.stat(a).st_dev == os.stat(b).st_dev
+    except OSError:
+        return True
+
+
+def _parallel_copytree(src: Path, dst: Path, workers: int = COPY_WORKERS):
+    """
+    并行复制目录树（替代 shutil.copytree）
+
+    先遍历一次源目录并串行创建全部目标目录，再把文件复制任务分发到线程池。
+    文件读写期间会释放 GIL，多个线程可以同时利用磁盘 I/O。
+    """
+    pairs = []
+    stack = [(Path(src), Path(dst))]
+    while stack:
+        src_dir, dst_dir = stack.pop()
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        with os.scandir(src_dir) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append((Path(entry.path), dst_dir / entry.name))
+                else:
+                    pairs.append((entry.path, dst_dir / entry.name))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # 遍历结果以便任一文件复制失败时抛出异常
+        for _ in executor.map(lambda pair: _copy2(*pair), pairs):
+            pass
+
+
+# 可以用硬链接备份的文件类型：代码和静态资源只会随更新整体替换，不会被原地改写
+_LINKABLE_SUFFIXES = frozenset({
+    '.py', '.pyc', '.pyi', '.pyd', '.so', '.dll',
+    '.js', '.mjs', '.cjs', '.ts', '.css', '.map', '.html', '.astro', '.vue',
+    '.svg', '.ico', '.png', '.jpg', '.jpeg', '.gif', '.webp',
+    '.woff', '.woff2', '.ttf', '.eot', '.md',
+})
+
+
+def _reflink(src: str, dst: str):
+    """通过 FICLONE 创建 CoW 副本，失败时清理目标文件并抛出 OSError"""
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        except OSError:
+            os.close(dst_fd)
+            os.unlink(dst)
+            raise
+        os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    shutil.copystat(src, dst)
+
+
+def _parallel_rmtree(root: Path, workers: int = COPY_WORKERS, ignore_errors: bool = False):
+    """
+    并行删除目录树（替代 shutil.rmtree）
+
+    自底向上遍历一次，文件在线程池中并发 unlink，目录随后按自底向上的顺序串行 rmdir。
+    """
+    files, dirs = [], []
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        files.extend(os.path.join(dirpath, name) for name in filenames)
+        for name in dirnames:
+            # 指向目录的符号链接只删除链接本身
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                files.append(path)
+        dirs.append(dirpath)
+
+    def unlink(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            if not ignore_errors:
+                raise
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(unlink, files):
+            pass
+
+    for path in dirs:
+        try:
+            os.rmdir(path)
+        except OSError:
+            if not ignore_errors:
+                raise
+
+
+def _fsync_fd(fd: int):
+    """把文件描述符对应的数据刷到磁盘（macOS 上 fsync 不刷磁盘缓存，改用 F_FULLFSYNC）"""
+    if fcntl is not None and hasattr(fcntl, 'F_FULLFSYNC'):
+        try:
+            fcntl.fcntl(fd, fcntl.F_FULLFSYNC)
+            return
+        except OSError:
+            pass
+    os.fsync(fd)
+
+
+def _write_all(fd: int, data: bytes):
+    """os.write 可能只写入一部分，循环直到全部写完"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _member_target(root: Path, info: ZipInfo) -> Optional[Path]:
+    """计算 ZIP 成员的解压路径，与 ZipFile.extract 一样去掉盘符、绝对路径和 '.'、'..' 组件"""
+    arcname = info.filename.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    parts = [part for part in arcname.split(os.path.sep) if part not in ('', os.path.curdir, os.path.pardir)]
+    return root.joinpath(*parts) if parts else None
+
+
+def _fsync_dir(path: Path):
+    """fsync 目录本身，使其中的 rename / 新建目录项持久化（Windows 不支持，直接跳过）"""
+    if os.name == 'nt':
+        return
+    fd = os.open(str(path), os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    try:
+        _fsync_fd(fd)
+    finally:
+        os.close(fd)
+
+
+def _link_tree(src: Path, dst: Path, exclude: tuple = ()):
+    """
+    以快照方式复制目录树（用于备份）
+
+    每个文件依次尝试：CoW reflink（仅 Linux）→ 硬链接 → shutil.copy2。
+    硬链接与应用目录共享 inode，原地写入会同时改动备份，因此只对代码和静态资源
+    （_LINKABLE_SUFFIXES，更新时整体替换、不会被原地修改）使用硬链接；数据库、日志、
+    上传文件、配置等其余文件只做 reflink 或复制。exclude 中的目录（如位于应用目录
+    内的备份目录自身）不进入快照。
+    """
+    use_reflink = fcntl is not None and sys.platform.startswith('linux')
+    use_link = hasattr(os, 'link')
+    excluded = {Path(path).resolve() for path in exclude}
+
+    stack = [(Path(src), Path(dst))]
+    while stack:
+        src_dir, dst_dir = stack.pop()
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        with os.scandir(src_dir) as entries:
+            for entry in entries:
+                target = dst_dir / entry.name
+                if entry.is_dir():
+                    if Path(entry.path).resolve() not in excluded:
+                        stack.append((Path(entry.path), target))
+                    continue
+
+                if use_reflink:
+                    try:
+                        _reflink(entry.path, str(target))
+                        continue
+                    except OSError as e:
+                        if e.errno not in _UNSUPPORTED_ERRNOS:
+                            raise
+                        use_reflink = False
+
+                if use_link and os.path.splitext(entry.name)[1].lower() in _LINKABLE_SUFFIXES:
+                    try:
+                        os.link(entry.path, target)
+                        continue
+                    except OSError as e:
+                        if e.errno not in _UNSUPPORTED_ERRNOS:
+                            raise
+                        use_link = False
+
+                _copy2(entry.path, target)
+
 
 class FastBlogUpdater:
     """FastBlog 更新器类"""
@@ -46,8 +405,12 @@ class FastBlogUpdater:
         self.target_version = target_version
         self.app_path = Path(app_path).resolve()
         self.base_dir = Path(__file__).resolve().parent.parent
-        self.temp_dir = Path(tempfile.mkdtemp(prefix="fastblog_update_"))
+        self.temp_dir = self._make_temp_dir()
         self.backup_dir = self.base_dir / "backups" / "update_backups"
+        # 下载时已通过服务器提供的 SHA-256 校验
+        self._verified = False
+        # 校验和解压阶段在主线程中共用的 ZipFile（只用于读取成员列表）
+        self._zip: Optional[ZipFile] = None
     
         # 确保备份目录存在
         self.backup_dir.mkdir(parents=True, exist_ok=True)
@@ -58,6 +421,30 @@ class FastBlogUpdater:
         logger.info(f"临时目录：{self.temp_dir}")
         logger.info(f"备份目录：{self.backup_dir}")
 
+    def _make_temp_dir(self) -> Path:
+        """
+        创建临时目录
+
+        临时目录需要与应用目录位于同一文件系统，这样 apply_update 中的 os.replace
+        才是一次 rename，而不是整棵目录树的复制；否则改为在应用目录旁边（父目录下）创建。
+        临时目录绝不能位于应用目录内部，否则无法把应用目录整体移入其中。
+        """
+        temp_dir = Path(tempfile.mkdtemp(prefix="fastblog_update_"))
+        if not _same_device(temp_dir, self.app_path.parent):
+            try:
+                sibling = Path(tempfile.mkdtemp(
+                    prefix=f".{self.app_path.name}_update_", dir=self.app_path.parent
+                ))
+            except OSError as e:
+                logger.warning(f"无法在 {self.app_path.parent} 下创建临时目录，替换时将改为复制：{e}")
+            else:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                temp_dir = sibling
+
+        if temp_dir.resolve().is_relative_to(self.app_path):
+            raise RuntimeError(f"临时目录 {temp_dir} 位于应用目录 {self.app_path} 内部")
+        return temp_dir
+
     def download_update_package(self) -> Optional[Path]:
         """下载更新包"""
         try:
@@ -73,19 +460,79 @@ class FastBlogUpdater:
             
             logger.info(f"尝试从更新服务器下载: {download_url}")
             
-            import requests
-            response = requests.get(download_url, timeout=60)
-            
-            if response.status_code == 200:
-                # 保存到releases目录
-                self.base_dir.mkdir(parents=True, exist_ok=True)
-                releases_dir = self.base_dir / "releases"
-                releases_dir.mkdir(exist_ok=True)
-                
-                package_file = releases_dir / f"update_{self.target_version}.zip"
-                with open(package_file, 'wb') as f:
-                    f.write(response.content)
-                
+            session = _get_session()
+
+            # 保存到releases目录
+            releases_dir = self.base_dir / "releases"
+            releases_dir.mkdir(parents=True, exist_ok=True)
+            package_file = releases_dir / f"update_{self.target_version}.zip"
+
+            # 服务器支持 Range 时分段并行下载（可断点续传）
+            if self._ranged_download(download_url, package_file):
+                logger.info(f"更新包下载成功: {package_file}")
+                return package_file
+
+            # 单连接下载：上次中断留下的 .part 文件通过 Range + If-Range 续传
+            part_file = package_file.with_name(package_file.name + '.part')
+            etag_file = package_file.with_name(package_file.name + '.etag')
+            state_file = package_file.with_name(package_file.name + '.state')
+            if state_file.exists():
+                # 分段下载遗留的文件布局不同，不能按末尾偏移续传
+                part_file.unlink(missing_ok=True)
+                state_file.unlink(missing_ok=True)
+
+            resume_from = part_file.stat().st_size if part_file.exists() else 0
+            headers = {}
+            if resume_from:
+                headers['Range'] = f'bytes={resume_from}-'
+                if etag_file.exists():
+                    headers['If-Range'] = etag_file.read_text().strip()
+
+            response = session.get(download_url, timeout=60, stream=True, headers=headers)
+            if response.status_code == 416:
+                # 续传偏移无效（文件已变化），重新完整下载
+                response.close()
+                response = session.get(download_url, timeout=60, stream=True)
+
+            if response.status_code in (200, 206):
+                # 206 从断点继续追加；200 表示服务器不支持续传或文件已变化，从头下载
+                offset = resume_from if response.status_code == 206 else 0
+                etag = response.headers.get('ETag')
+                if etag:
+                    etag_file.write_text(etag)
+
+                sha256 = hashlib.sha256()
+                expected = response.headers.get(CHECKSUM_HEADER)
+                if offset and expected:
+                    with open(part_file, 'rb') as f:
+                        while block := f.read(DOWNLOAD_CHUNK_SIZE):
+                            sha256.update(block)
+
+                fd = os.open(part_file, os.O_WRONLY | os.O_CREAT, 0o644)
+                written = 0
+                try:
+                    # 未压缩传输且长度已知时预分配空间，减少文件碎片
+                    size = int(response.headers.get('Content-Length') or 0)
+                    if size and not response.headers.get('Content-Encoding') and hasattr(os, 'posix_fallocate'):
+                        os.posix_fallocate(fd, offset, size)
+                    os.lseek(fd, offset, os.SEEK_SET)
+
+                    # 直接读取 urllib3 原始流并用 os.write 写入，绕过 iter_content 和缓冲文件对象
+                    for chunk in response.raw.stream(DOWNLOAD_CHUNK_SIZE, decode_content=True):
+                        sha256.update(chunk)
+                        _write_all(fd, chunk)
+                        written += len(chunk)
+                finally:
+                    # 中断时也截掉预分配的尾部，下次续传偏移才准确
+                    os.ftruncate(fd, offset + written)
+                    os.close(fd)
+
+                if expected:
+                    self._check_checksum(part_file, sha256.hexdigest(), expected)
+
+                os.replace(part_file, package_file)
+                etag_file.unlink(missing_ok=True)
+
                 logger.info(f"更新包下载成功: {package_file}")
                 return package_file
             else:
@@ -103,21 +550,147 @@ class FastBlogUpdater:
             traceback.print_exc()
             return None
 
+    def _ranged_download(self, url: str, dest: Path, parts: int = DOWNLOAD_PARTS) -> bool:
+        """
+        分段并行下载（HTTP Range）
+
+        先 HEAD 获取文件大小，再按字节区间并发请求，各线程用 os.pwrite 写入预分配的
+        dest.part 文件。已完成的区间记录在 dest.state 中，重新执行更新时只下载缺失部分。
+
+        Returns:
+            下载完成返回 True；服务器不支持 Range 或文件过小时返回 False，由调用方单连接下载
+        """
+        if not hasattr(os, 'pwrite'):
+            return False
+
+        session = _get_session()
+        try:
+            head = session.head(url, timeout=30, allow_redirects=True)
+            size = int(head.headers.get('Content-Length') or 0)
+        except Exception as e:
+            # HEAD 不可用时不影响下载，交给单连接 GET
+            logger.info(f"HEAD 请求失败，改用单连接下载：{e}")
+            return False
+        if (head.status_code != 200
+                or head.headers.get('Accept-Ranges', '').lower() != 'bytes'
+                or size < DOWNLOAD_MIN_RANGE_SIZE):
+            return False
+
+        part_file = dest.with_name(dest.name + '.part')
+        state_file = dest.with_name(dest.name + '.state')
+        etag = head.headers.get('ETag', '')
+
+        # 读取上次未完成的下载进度，文件大小或 ETag 变化时重新下载
+        done = set()
+        try:
+            state = json.loads(state_file.read_text(encoding='utf-8'))
+            if (state.get('size') == size and state.get('etag') == etag
+                    and part_file.exists() and part_file.stat().st_size == size):
+                done = {tuple(r) for r in state.get('done', [])}
+        except (OSError, ValueError):
+            pass
+
+        step = -(-size // parts)
+        ranges = [(lo, min(lo + step, size) - 1) for lo in range(0, size, step)]
+        pending = [r for r in ranges if r not in done]
+
+        lock = threading.Lock()
+
+        def save_state():
+            state_file.write_text(
+                json.dumps({'size': size, 'etag': etag, 'done': sorted(done)}),
+                encoding='utf-8',
+            )
+
+        fd = os.open(part_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if not done:
+                # 重新开始时截断到目标大小，丢弃旧 .part（可能来自更大的旧包）多出的尾部
+                os.ftruncate(fd, size)
+                if hasattr(os, 'posix_fallocate'):
+                    os.posix_fallocate(fd, 0, size)
+
+            def fetch(byte_range):
+                lo, hi = byte_range
+                with session.get(url, headers={'Range': f'bytes={lo}-{hi}'}, stream=True, timeout=60) as resp:
+                    if resp.status_code != 206:
+                        return False
+                    offset = lo
+                    for chunk in resp.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        os.pwrite(fd, chunk, offset)
+                        offset += len(chunk)
+                if offset != hi + 1:
+                    raise IOError(f"区间 {lo}-{hi} 下载不完整")
+                with lock:
+                    done.add(byte_range)
+                    save_state()
+                return True
+
+            with ThreadPoolExecutor(max_workers=parts) as executor:
+                results = list(executor.map(fetch, pending))
+        finally:
+            os.close(fd)
+
+        if not all(results):
+            # 服务器返回 200 而非 206，不支持分段，丢弃临时文件
+            part_file.unlink(missing_ok=True)
+            state_file.unlink(missing_ok=True)
+            return False
+
+        state_file.unlink(missing_ok=True)
+        expected = head.headers.get(CHECKSUM_HEADER)
+        if expected:
+            with open(part_file, 'rb') as f:
+                digest = hashlib.file_digest(f, 'sha256').hexdigest()
+            self._check_checksum(part_file, digest, expected)
+
+        os.replace(part_file, dest)
+        return True
+
+    def _check_checksum(self, package_file: Path, digest: str, expected: str):
+        """比对下载内容的 SHA-256，不一致时删除文件并抛出异常"""
+        if digest != expected.strip().lower():
+            package_file.unlink(missing_ok=True)
+            raise IOError(f"更新包 SHA-256 校验失败：期望 {expected}，实际 {digest}")
+        self._verified = True
+
+    def _open_package(self, package_file: Path) -> ZipFile:
+        """打开更新包（缓存 ZipFile，校验和解压阶段复用同一份成员列表；仅限主线程使用）"""
+        if self._zip is None or self._zip.filename != str(package_file):
+            if self._zip is not None:
+                self._zip.close()
+            self._zip = ZipFile(package_file, 'r')
+        return self._zip
+
     def verify_package_integrity(self, package_file: Path) -> bool:
         """验证更新包完整性"""
         try:
             # 这里可以添加校验和验证、数字签名验证等
-            if not package_file.exists():
+            try:
+                st = os.stat(package_file)
+            except FileNotFoundError:
                 return False
 
             # 简单的文件大小检查
-            if package_file.stat().st_size < 1024:  # 小于1KB认为无效
+            if st.st_size < 1024:  # 小于1KB认为无效
                 logger.error("更新包文件过小")
                 return False
 
-            # 尝试解压验证
-            with ZipFile(package_file, 'r') as zip_ref:
-                zip_ref.testzip()  # 测试ZIP文件完整性
+            if self._verified:
+                logger.info("更新包已通过 SHA-256 校验")
+                return True
+
+            # 并行解压校验每个成员的 CRC（每个工作线程使用自己的 ZipFile）
+            infos = [info for info in self._open_package(package_file).infolist() if not info.is_dir()]
+
+            def check_member(zip_ref, info):
+                # 读到末尾时 CRC 不匹配会抛出 BadZipFile
+                with zip_ref.open(info) as member:
+                    while member.read(DOWNLOAD_CHUNK_SIZE):
+                        pass
+
+            workers = max(1, min(os.cpu_count() or 1, len(infos)))
+            _map_zip_members(package_file, infos, check_member, workers)
 
             logger.info("更新包完整性验证通过")
             return True
@@ -126,55 +699,101 @@ class FastBlogUpdater:
             logger.error(f"更新包验证失败: {e}")
             return False
 
-    def backup_current_version(self) -> bool:
-        """备份当前版本"""
+    def backup_current_version(self) -> Optional[Path]:
+        """备份当前版本，返回创建的备份目录，失败时返回 None"""
         try:
-            backup_name = f"backup_{int(time.time())}"
-            backup_path = self.backup_dir / backup_name
+            timestamp = int(time.time())
+            backup_path = self.backup_dir / f"backup_{timestamp}"
 
             logger.info(f"开始备份当前版本到: {backup_path}")
 
-            # 复制整个应用目录
-            shutil.copytree(self.app_path, backup_path, dirs_exist_ok=True)
+            # 以快照方式备份整个应用目录（备份目录位于应用目录内时跳过其自身）
+            _link_tree(self.app_path, backup_path, exclude=(self.backup_dir,))
 
             # 记录备份信息
             backup_info = {
-                "timestamp": int(time.time()),
+                "timestamp": timestamp,
                 "version": self.get_current_version(),
                 "backup_path": str(backup_path)
             }
 
+            # 仅供 rollback 读取，使用紧凑格式
             info_file = backup_path / "backup_info.json"
-            with open(info_file, 'w', encoding='utf-8') as f:
-                json.dump(backup_info, f, indent=2, ensure_ascii=False)
+            info_file.write_bytes(json.dumps(backup_info, separators=(",", ":")).encode())
 
             logger.info("当前版本备份完成")
-            return True
+            self.prune_backups()
+            return backup_path
 
         except Exception as e:
             logger.error(f"备份当前版本失败: {e}")
-            return False
+            return None
+
+    def _list_backups(self) -> list:
+        """列出 backup_<时间戳> 备份目录，按时间戳从新到旧排序"""
+        return sorted(
+            (path for path in self.backup_dir.iterdir()
+             if path.is_dir() and path.name.startswith("backup_") and path.name[7:].isdigit()),
+            key=lambda path: int(path.name[7:]),
+            reverse=True,
+        )
+
+    def prune_backups(self, keep: int = BACKUP_KEEP):
+        """只保留最新的 keep 份备份，其余的删除"""
+        try:
+            for path in self._list_backups()[keep:]:
+                logger.info(f"删除旧备份：{path}")
+                _parallel_rmtree(path)
+        except Exception as e:
+            logger.warning(f"清理旧备份失败：{e}")
 
     def get_current_version(self) -> str:
         """获取当前版本号"""
         try:
             # 使用版本管理器获取后端版本
-            backend_info = version_manager.get_backend_version()
+            backend_info = get_version_manager().get_backend_version()
             return backend_info.get('version', '0.0.0')
         except Exception as e:
             logger.warning(f"获取当前版本失败，使用默认版本：{e}")
             return "0.0.0"
 
     def extract_update_package(self, package_file: Path) -> Optional[Path]:
-        """解压更新包"""
+        """解压更新包（直接解压到待替换的暂存目录，apply_update 无需再复制一遍）"""
         try:
-            extract_path = self.temp_dir / "extracted"
+            extract_path = self.temp_dir / "temp_app"
             extract_path.mkdir(exist_ok=True)
 
             logger.info(f"开始解压更新包到: {extract_path}")
 
-            with ZipFile(package_file, 'r') as zip_ref:
-                zip_ref.extractall(extract_path)
+            # 先串行创建目录，再在线程池中并行解压文件（每个工作线程使用自己的 ZipFile）
+            members = []
+            for info in self._open_package(package_file).infolist():
+                target = _member_target(extract_path, info)
+                if target is None:
+                    continue
+                if info.is_dir():
+                    target.mkdir(parents=True, exist_ok=True)
+                else:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    members.append((info, target))
+
+            def extract_member(zip_ref, item):
+                info, target = item
+                with zip_ref.open(info) as member:
+                    fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                    try:
+                        if info.file_size and hasattr(os, 'posix_fallocate'):
+                            os.posix_fallocate(fd, 0, info.file_size)
+                        while chunk := member.read(DOWNLOAD_CHUNK_SIZE):
+                            _write_all(fd, chunk)
+                        # 替换应用目录前确保新文件已经落盘，避免崩溃后留下空文件
+                        if os.name != 'nt':
+                            _fsync_fd(fd)
+                    finally:
+                        os.close(fd)
+
+            workers = max(1, min(os.cpu_count() or 1, len(members)))
+            _map_zip_members(package_file, members, extract_member, workers)
 
             logger.info("更新包解压完成")
             return extract_path
@@ -188,6 +807,13 @@ class FastBlogUpdater:
         try:
             logger.info("正在停止主应用程序...")
 
+            # 优先根据主程序写入的 PID 文件直接发送信号，无需扫描全部进程；
+            # PID 文件残留、进程身份不符或未能确认退出时继续走下面的进程扫描
+            pid_file = self.app_path / MAIN_PID_FILE
+            if os.name != 'nt' and pid_file.exists() and self._stop_by_pid_file(pid_file):
+                logger.info("主应用程序已停止")
+                return True
+
             # 这里需要实现进程查找和终止逻辑
             # 可以通过进程名、PID文件等方式识别主程序进程
 
@@ -215,28 +841,111 @@ class FastBlogUpdater:
             logger.error(f"停止主应用程序失败: {e}")
             return False
 
-    def apply_update(self, extracted_path: Path) -> bool:
-        """应用更新"""
+    def _stop_by_pid_file(self, pid_file: Path) -> bool:
+        """
+        向 PID 文件中的主程序发送 SIGTERM，超时仍未退出则发送 SIGKILL
+
+        发信号前先确认该 PID 仍是写入 PID 文件的主程序（见 _is_main_process），
+        残留或不匹配的 PID 文件会被删除。
+
+        Returns:
+            确认主程序已退出返回 True；否则返回 False，由调用方改用进程扫描
+        """
         try:
-            logger.info("开始应用更新...")
+            pid = int(pid_file.read_text().strip())
+        except (OSError, ValueError):
+            logger.warning(f"PID 文件内容无效，已删除：{pid_file}")
+            pid_file.unlink(missing_ok=True)
+            return False
+
+        if not _is_main_process(pid, pid_file):
+            logger.warning(f"PID 文件已失效（进程 {pid} 不存在或不是主程序），已删除：{pid_file}")
+            pid_file.unlink(missing_ok=True)
+            return False
+
+        def alive() -> bool:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return False
+            except PermissionError:
+                return True
+            return True
 
-            # 确保目标目录存在
-            self.app_path.mkdir(parents=True, exist_ok=True)
+        def wait_exit(timeout: float) -> bool:
+            deadline = time.monotonic() + timeout
+            while alive():
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.1)
+            return True
 
-            # 使用临时目录进行原子性更新
-            temp_app_path = self.temp_dir / "temp_app"
-            shutil.copytree(extracted_path, temp_app_path, dirs_exist_ok=True)
+        logger.info(f"终止进程 PID: {pid}")
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
 
-            # 原子性替换（先移动旧版本，再移动新版本）
+        if not wait_exit(STOP_TIMEOUT):
+            logger.warning(f"进程 {pid} 未在 {STOP_TIMEOUT:.0f} 秒内退出，强制终止")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            if not wait_exit(STOP_KILL_TIMEOUT):
+                logger.error(f"进程 {pid} 在 SIGKILL 后仍未退出")
+                return False
+
+        # SIGKILL 时主程序来不及清理自己的 PID 文件
+        pid_file.unlink(missing_ok=True)
+        return True
+
+    def _rename(self, src: Path, dst: Path):
+        """用 os.replace 原子重命名；跨文件系统（EXDEV）时退回 shutil.move 复制"""
+        try:
+            os.replace(src, dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            logger.warning(f"{src} 与 {dst} 不在同一文件系统，改为复制（建议把临时目录放在应用目录所在的磁盘）")
+            shutil.move(str(src), str(dst))
+
+    def _carry_over_backups(self, old_app_path: Path):
+        """备份目录位于应用目录内时，把它从被替换下来的旧版本中移到新版本里，避免随旧版本一起删除"""
+        if not self.backup_dir.is_relative_to(self.app_path):
+            return
+        relative = self.backup_dir.relative_to(self.app_path)
+        old_backups = old_app_path / relative
+        if old_backups.exists() and not self.backup_dir.exists():
+            self.backup_dir.parent.mkdir(parents=True, exist_ok=True)
+            self._rename(old_backups, self.backup_dir)
+
+    def apply_update(self, staged_path: Path) -> bool:
+        """应用更新（staged_path 为 extract_update_package 解压出的暂存目录）"""
+        try:
+            logger.info("开始应用更新...")
+
+            # 确保目标目录的父目录存在
+            self.app_path.parent.mkdir(parents=True, exist_ok=True)
+
+            # 原子性替换（先移动旧版本，再移动新版本），两次都是 rename
             old_app_backup = self.temp_dir / "old_app"
             if self.app_path.exists():
-                shutil.move(str(self.app_path), str(old_app_backup))
+                self._rename(self.app_path, old_app_backup)
 
-            shutil.move(str(temp_app_path), str(self.app_path))
+            try:
+                self._rename(staged_path, self.app_path)
+            except OSError:
+                # 新版本没能就位时先把旧版本移回，保证应用目录（以及其中的备份）存在
+                if old_app_backup.exists() and not self.app_path.exists():
+                    self._rename(old_app_backup, self.app_path)
+                raise
+            self._carry_over_backups(old_app_backup)
+            _fsync_dir(self.app_path.parent)
 
             # 清理临时的旧版本
             if old_app_backup.exists():
-                shutil.rmtree(old_app_backup)
+                _parallel_rmtree(old_app_backup)
 
             logger.info("更新应用完成")
             return True
@@ -247,9 +956,13 @@ class FastBlogUpdater:
 
     def cleanup(self):
         """清理临时文件"""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
         try:
             if self.temp_dir.exists():
-                shutil.rmtree(self.temp_dir)
+                _parallel_rmtree(self.temp_dir)
                 logger.info("临时文件清理完成")
         except Exception as e:
             logger.warning(f"清理临时文件失败: {e}")
@@ -259,34 +972,30 @@ class FastBlogUpdater:
         try:
             logger.info("开始回滚操作...")
 
-            # 查找最新的备份
-            backups = []
-            for backup_dir in self.backup_dir.iterdir():
-                if backup_dir.is_dir():
-                    info_file = backup_dir / "backup_info.json"
-                    if info_file.exists():
-                        try:
-                            with open(info_file, 'r', encoding='utf-8') as f:
-                                info = json.load(f)
-                                backups.append((info['timestamp'], backup_dir))
-                        except Exception:
-                            pass
-
-            if not backups:
+            # 查找最新的备份：按目录名中的时间戳排序，只校验选中备份的 backup_info.json
+            latest_backup = None
+            for backup_dir in self._list_backups():
+                try:
+                    json.loads((backup_dir / "backup_info.json").read_bytes())
+                except Exception:
+                    continue
+                latest_backup = backup_dir
+                break
+
+            if latest_backup is None:
                 logger.error("未找到可用的备份")
                 return False
 
-            # 按时间排序，获取最新的备份
-            backups.sort(reverse=True)
-            latest_backup = backups[0][1]
-
             logger.info(f"使用备份进行回滚: {latest_backup}")
 
-            # 执行回滚
-            if self.app_path.exists():
-                shutil.rmtree(self.app_path)
+            # 执行回滚：备份不在应用目录内时，通过两次 rename 原子地换回备份
+            if not latest_backup.is_relative_to(self.app_path) and self._swap_in_backup(latest_backup):
+                logger.info("回滚完成")
+                return True
 
-            shutil.copytree(latest_backup, self.app_path)
+            self._clear_app_path()
+            _parallel_copytree(latest_backup, self.app_path)
+            (self.app_path / "backup_info.json").unlink(missing_ok=True)
 
             logger.info("回滚完成")
             return True
@@ -295,6 +1004,54 @@ class FastBlogUpdater:
             logger.error(f"回滚失败: {e}")
             return False
 
+    def _clear_app_path(self):
+        """清空应用目录；备份目录位于应用目录内时保留通往备份目录的各级目录"""
+        if not self.app_path.exists():
+            return
+        if not self.backup_dir.is_relative_to(self.app_path):
+            _parallel_rmtree(self.app_path)
+            return
+
+        current = self.app_path
+        for part in self.backup_dir.relative_to(self.app_path).parts:
+            for entry in current.iterdir():
+                if entry.name == part:
+                    continue
+                if entry.is_dir() and not entry.is_symlink():
+                    _parallel_rmtree(entry)
+                else:
+                    entry.unlink()
+            current = current / part
+
+    def _swap_in_backup(self, backup_path: Path) -> bool:
+        """
+        用 rename 把备份目录换成应用目录（备份会被消耗）
+
+        先把当前应用目录移到一旁，再把备份移到应用目录位置，最后在后台线程中删除
+        移开的旧目录。备份与应用目录不在同一文件系统时返回 False，由调用方改为复制。
+        """
+        broken_path = self.app_path.with_name(f"{self.app_path.name}.broken.{int(time.time())}")
+        if self.app_path.exists():
+            os.replace(self.app_path, broken_path)
+
+        try:
+            os.replace(backup_path, self.app_path)
+        except OSError as e:
+            if broken_path.exists():
+                os.replace(broken_path, self.app_path)
+            if e.errno == errno.EXDEV:
+                return False
+            raise
+
+        (self.app_path / "backup_info.json").unlink(missing_ok=True)
+        _fsync_dir(self.app_path.parent)
+
+        if broken_path.exists():
+            threading.Thread(
+                target=_parallel_rmtree, args=(broken_path,), kwargs={'ignore_errors': True}
+            ).start()
+        return True
+
     def update(self) -> bool:
         """执行完整的更新流程"""
         logger.info("=== 开始执行更新 ===")
@@ -328,13 +1085,7 @@ class FastBlogUpdater:
                     )
                 return False
     
-            # 3. 备份当前版本
-            backup_success = self.backup_current_version()
-            backup_path = str(self.backup_dir / f"backup_{int(time.time())}") if backup_success else None
-            if not backup_success:
-                logger.warning("备份失败，但仍继续更新")
-    
-            # 4. 解压更新包
+            # 3. 解压更新包
             extracted_path = self.extract_update_package(package_file)
             if not extracted_path:
                 if add_update_history:
@@ -343,15 +1094,20 @@ class FastBlogUpdater:
                         to_version=self.target_version,
                         status='failed',
                         error='解压更新包失败',
-                        backup_path=backup_path,
                         duration=time.time() - start_time
                     )
                 return False
     
-            # 5. 停止主应用程序
+            # 4. 停止主应用程序
             if not self.stop_main_application():
                 logger.warning("停止主程序失败，可能影响更新")
     
+            # 5. 备份当前版本（主程序停止后进行，备份与应用共享的文件不会再被改写）
+            created_backup = self.backup_current_version()
+            backup_path = str(created_backup) if created_backup else None
+            if not created_backup:
+                logger.warning("备份失败，但仍继续更新")
+    
             # 6. 应用更新
             if not self.apply_update(extracted_path):
                 logger.error("更新应用失败，尝试回滚")
@@ -399,8 +1155,28 @@ class FastBlogUpdater:
             self.cleanup()
 
 
+def _buffer_file_handlers(log: logging.Logger, capacity: int = 1024):
+    """
+    把日志的文件 handler 换成 MemoryHandler
+
+    INFO 日志先在内存中累积，遇到 WARNING 及以上、缓冲满或进程退出时才一次性写入文件，
+    避免复制 / 回滚过程中的大量日志逐行写盘。控制台输出不受影响。
+    """
+    for handler in list(log.handlers):
+        if isinstance(handler, logging.FileHandler):
+            buffered = logging.handlers.MemoryHandler(
+                capacity=capacity, flushLevel=logging.WARNING, target=handler
+            )
+            buffered.setLevel(handler.level)
+            log.removeHandler(handler)
+            log.addHandler(buffered)
+            atexit.register(buffered.flush)
+
+
 def main():
     """更新器入口函数"""
+    _buffer_file_handlers(logger)
+
     parser = argparse.ArgumentParser(description="FastBlog 独立更新器")
     parser.add_argument("--target-version", required=True, help="目标版本号")
     parser.add_argument("--app-path", required=True, help="应用程序路径")